@@ -1,6 +1,6 @@
 from .bot import TradeKitBot
-from .database import TradeKitDB
-from .models import TradeKitPosition
+from .database import TradeKitDB, InMemoryTradeKitDB, AsyncTradeKitDB
+from .models import TradeKitPosition, OHLCVView, PositionTable, Action, PositionType, Status
 from .broker import TradeKitBroker
 
-__all__ = ["TradeKitBot", "TradeKitDB", "TradeKitPosition", "TradeKitBroker"]
\ No newline at end of file
+__all__ = ["TradeKitBot", "TradeKitDB", "InMemoryTradeKitDB", "AsyncTradeKitDB", "TradeKitPosition", "TradeKitBroker", "OHLCVView", "PositionTable", "Action", "PositionType", "Status"]
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""
+Ahead-of-time build of the numba kernels in _kernels.py.
+
+Running ``python -m tradekit._aot`` compiles the kernels for the signatures used by
+TradeKitBot.run_vectorized into a ``_tk_kernels`` extension module next to this file.
+When that module is importable _kernels uses it and no JIT compilation happens at runtime.
+Strategy kernels passed to run_vectorized can be built the same way with compile_strategy().
+"""
+import os
+from numba.pycc import CC
+from ._kernels import _backtest_kernel
+
+cc = CC("_tk_kernels")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+
+cc.export(
+    "backtest_kernel",
+    "Tuple((i8, f8, f8, i8[:], i8[:], i8[:], i8, i8))(f8[:], i1[:], i8, f8, f8, f8, f8, i8)"
+)(_backtest_kernel)
+
+# signature of a run_vectorized kernel over float64 data: (open, high, low, close, volume, ts) -> actions
+STRATEGY_SIGNATURE = "i1[:](f8[:], f8[:], f8[:], f8[:], f8[:], i8[:])"
+
+def compile_strategy(kernel, module_name: str, output_dir: str = ".") -> str:
+    """
+    Compile a run_vectorized kernel ahead of time into the extension module module_name in output_dir
+    and return the path of the built module. The kernel must return the int8 action array and is
+    compiled for float64 data, i.e. load_data() called with the default dtype. Import the module and
+    pass its function, named like the kernel, to run_vectorized to skip the JIT warm-up.
+    """
+    strategy_cc = CC(module_name)
+    strategy_cc.output_dir = output_dir
+    # an @njit kernel is compiled from its Python source
+    strategy_cc.export(kernel.__name__, STRATEGY_SIGNATURE)(getattr(kernel, "py_func", kernel))
+    strategy_cc.compile()
+    return os.path.join(output_dir, strategy_cc.output_file)
+
+if __name__ == "__main__":
+    cc.compile()
@@ -0,0 +1,85 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional, without it the kernels run as plain Python functions
+    def njit(*args, **kwargs):
+        """Fallback for numba.njit that returns the decorated function unchanged."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda func: func
+
+# per-bar actions returned by vectorized strategies
+HOLD = 0
+BUY = 1
+SELL = -1
+
+# policy codes understood by _backtest_kernel, see TradeKitBot.insufficient_resources_policy
+ADJUST = 0
+SKIP = 1
+HALT = 2
+POLICY_CODES = {"adjust": ADJUST, "skip": SKIP, "halt": HALT}
+
+# errors reported by _backtest_kernel
+OK = 0
+INSUFFICIENT_RESOURCES = 1
+INSUFFICIENT_FUNDS = 2
+
+def _backtest_kernel(close, actions, entry, cash, holdings, buy_factor, sell_ratio, policy):
+    """
+    Simulate the fills of a single position type from flat over the per-bar actions, filling at the
+    close price. Entries are sized like TradeKitBot.calculate_buy_quantity for LONG positions and from
+    the holdings for SHORT ones, an exit closes the whole position.
+    Returns the number of positions, the final cash and holdings, the entry bar, exit bar (-1 while
+    open) and quantity of every position, and an error code with the bar it happened on. On error
+    the fills up to that bar are returned.
+    """
+    n = close.shape[0]
+    entry_bar = np.empty(n, dtype=np.int64)
+    exit_bar = np.empty(n, dtype=np.int64)
+    quantity = np.empty(n, dtype=np.int64)
+    count = 0
+    in_position = False
+    for i in range(n):
+        price = close[i]
+        if not in_position and actions[i] == entry:
+            if entry == BUY:
+                q = int(cash * buy_factor / price)
+            else:
+                q = int(holdings * sell_ratio)
+            if q <= 0:
+                if policy == HALT:
+                    return count, cash, holdings, entry_bar[:count], exit_bar[:count], quantity[:count], INSUFFICIENT_RESOURCES, i
+                # adjust and skip both leave the bar without a trade
+                continue
+            if entry == BUY:
+                cash -= q * price
+                holdings += q
+            else:
+                holdings -= q
+                cash += q * price
+            entry_bar[count] = i
+            exit_bar[count] = -1
+            quantity[count] = q
+            count += 1
+            in_position = True
+        elif in_position and actions[i] == -entry:
+            q = quantity[count - 1]
+            if entry == BUY:
+                holdings -= q
+                cash += q * price
+            else:
+                if q * price > cash:
+                    return count, cash, holdings, entry_bar[:count], exit_bar[:count], quantity[:count], INSUFFICIENT_FUNDS, i
+                cash -= q * price
+                holdings += q
+            exit_bar[count - 1] = i
+            in_position = False
+    return count, cash, holdings, entry_bar[:count], exit_bar[:count], quantity[:count], OK, -1
+
+try:
+    # precompiled by _aot.py, skips the JIT compilation on first use
+    from ._tk_kernels import backtest_kernel
+except ImportError:
+    backtest_kernel = njit(cache=True)(_backtest_kernel)
@@ -1,15 +1,63 @@
-import pandas as pd
-from typing import Callable, Optional, Literal
-from .models import TradeKitPosition
-from .database import TradeKitDB
+import contextlib
+from datetime import date, datetime
+import numpy as np
+from typing import TYPE_CHECKING, Callable, Optional, Literal, Union
+from .models import TradeKitPosition, OHLCVView, PositionTable, _datetime_from_ns, _datetime_to_ns
+from .database import TradeKitDB, InMemoryTradeKitDB
 from .broker import TradeKitBroker
+from ._kernels import BUY, SELL, POLICY_CODES, INSUFFICIENT_RESOURCES, INSUFFICIENT_FUNDS, backtest_kernel
+
+try:
+    import polars as pl
+except ImportError:
+    # polars is optional, load_data then only accepts pandas DataFrames
+    pl = None
+
+if TYPE_CHECKING:
+    # pandas is imported by load_data() and the data property on first use, bots that never touch a pandas frame skip its import
+    import pandas as pd
+
+def _as_datetime(value) -> datetime:
+    """Convert an observed date given as an ISO 8601 string, a date, a numpy datetime64 or nanoseconds since the epoch to a datetime."""
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    if isinstance(value, np.datetime64):
+        value = value.astype("datetime64[ns]").astype(np.int64)
+    if isinstance(value, (int, np.integer)):
+        return _datetime_from_ns(value)
+    raise TypeError(f"Invalid observed_date: {value!r}. Must be a datetime, an ISO 8601 string or a numpy datetime64")
+
+def _policy_adjust(trade_type: str) -> int:
+    """'adjust' policy, trade what the available resources allow, i.e. nothing."""
+    return 0
+
+def _policy_skip(trade_type: str) -> int:
+    """'skip' policy, the trade is skipped."""
+    return 0
+
+def _policy_halt(trade_type: str) -> int:
+    """'halt' policy, trading stops."""
+    raise RuntimeError(f"Cannot execute {trade_type} trade: insufficient resources.")
 
 class TradeKitBot:
+    REQUIRED_COLUMNS = frozenset(OHLCVView._fields)
+    INSUFFICIENT_RESOURCES_POLICIES = frozenset(("adjust", "skip", "halt"))
+    # what enforce_quantity_policy does with a zero quantity under each policy
+    _POLICY_FUNCTIONS = {
+        "adjust": _policy_adjust,
+        "skip": _policy_skip,
+        "halt": _policy_halt
+    }
+
     def __init__(
         self,
         name: str,
         ticker: str,
-        db: TradeKitDB,
+        db: Optional[TradeKitDB],
         broker: TradeKitBroker,
         mode: Literal["live", "backtest"] = "live"
     ):
@@ -17,6 +65,8 @@ class TradeKitBot:
         TradeKitBot is a class that represents a trading bot. It is responsible for managing the trading strategy,
         executing trades, and interacting with the broker and the database.
         It includes methods for loading data, calculating trade quantities, and placing orders.
+        In backtest mode db can be None, the positions are then kept in an InMemoryTradeKitDB shared 
+        with the broker.
         """
         self.name = name
         self.ticker = ticker
@@ -24,9 +74,28 @@ class TradeKitBot:
         if mode not in ["live", "backtest"]:
             raise ValueError(f"Invalid mode: {mode}")
         self.mode = mode
-        self.data = pd.DataFrame()
+        # built on first access to the data property
+        self._data = None
+        self.ohlcv = {}
+        self.ts = np.empty(0, dtype=np.int64)
+        # name -> function computing the indicator from the loaded data, and the arrays computed for the current data
+        self._indicators = {}
+        self._indicator_values = {}
+        if db is None:
+            if mode != "backtest":
+                raise ValueError("A database is required in live mode")
+            db = InMemoryTradeKitDB()
+            if broker.db is None:
+                broker.db = db
         self.db = db
+        # ledger of the last run_vectorized() call
+        self.positions = None
+        # backtests write their positions in batches, see flush_orders(). The buffer is the bot's own,
+        # other bots sharing the database keep writing right away
+        self._write_buffer = self.db.write_buffer() if mode == "backtest" else None
         self.position = None
+        # observed date of the order being placed, backtest orders are stamped with it, see submit_order()
+        self._bar_time = None
 
         # determines the % of cash that can be spent 
         # on a single trade. Default is "moderate"
@@ -36,6 +105,9 @@ class TradeKitBot:
             "conservative": 0.4 # 40%
         }
         self.buy_aggressiveness = "moderate"
+        self._buy_ratio = self.buy_aggressiveness_levels[self.buy_aggressiveness]
+        self._update_buy_budget_factor()
+        broker._bots.add(self)
 
         # determines the % of assets that can be sold 
         # on a single trade. Default is "max"
@@ -45,22 +117,29 @@ class TradeKitBot:
             "conservative": 0.4 # 40%
         }
         self.sell_aggressiveness = "max"
+        self._sell_ratio = self.sell_aggressiveness_levels[self.sell_aggressiveness]
 
         # whether stop the trade or buy/sell with the available resurces
         # adjust - buy/sell with the available resources
         # skip - skip the trade
         # halt - stop the trade        
-        self.insufficient_resources_policy_values = {
-            "adjust",
-            "skip",
-            "halt"
-        }
+        self.insufficient_resources_policy_values = self.INSUFFICIENT_RESOURCES_POLICIES
         self.insufficient_resources_policy = "adjust"
 
+        # (action, position_type) -> how submit_order persists the position
+        self._submit_dispatch = {
+            ("BUY", "LONG"): self._submit_create,
+            ("BUY", "SHORT"): self._submit_update_with_exit,
+            ("SELL", "LONG"): self._submit_update_with_exit,
+            ("SELL", "SHORT"): self._submit_create
+        }
+
     def set_buy_aggressiveness(self, level: str):
         """Set the aggressiveness level for buying. Must be one of 'max', 'moderate', or 'conservative'."""
         if level in self.buy_aggressiveness_levels:
             self.buy_aggressiveness = level
+            self._buy_ratio = self.buy_aggressiveness_levels[level]
+            self._update_buy_budget_factor()
         else:
             raise ValueError(f"Invalid aggressiveness level: {level}")
     
@@ -75,11 +154,18 @@ class TradeKitBot:
             "moderate": moderate_ratio,
             "conservative": conservative_ratio
         }
+        self._buy_ratio = self.buy_aggressiveness_levels[self.buy_aggressiveness]
+        self._update_buy_budget_factor()
+
+    def _update_buy_budget_factor(self):
+        """Precompute the share of cash that goes into a buy order once the commission is deducted."""
+        self._buy_budget_factor = self._buy_ratio * (1 - self.broker.commission)
 
     def set_sell_aggressiveness(self, level: str):
         """Set the aggressiveness level for selling. Must be one of 'max', 'moderate', or 'conservative'."""
         if level in self.sell_aggressiveness_levels:
             self.sell_aggressiveness = level
+            self._sell_ratio = self.sell_aggressiveness_levels[level]
         else:
             raise ValueError(f"Invalid aggressiveness level: {level}")
     
@@ -94,6 +180,7 @@ class TradeKitBot:
             "moderate": moderate_ratio,
             "conservative": conservative_ratio
         }
+        self._sell_ratio = self.sell_aggressiveness_levels[self.sell_aggressiveness]
 
     def set_insufficient_resources_policy(self, policy: str):
         """
@@ -106,30 +193,167 @@ class TradeKitBot:
             raise ValueError(f"Invalid policy: {policy}. Must be one of {self.insufficient_resources_policy_values}")
         self.insufficient_resources_policy = policy
 
-    def load_data(self, data):
-        """Load the historic trade data. The dataframe must include OHLC and volume information as well as an index of type datetime."""
+    @property
+    def insufficient_resources_policy(self) -> str:
+        """Policy applied when there are not enough resources for a trade, see set_insufficient_resources_policy()."""
+        return self._insufficient_resources_policy
+
+    @insufficient_resources_policy.setter
+    def insufficient_resources_policy(self, policy: str):
+        if policy not in self._POLICY_FUNCTIONS:
+            raise ValueError(f"Invalid insufficient_resources_policy: {policy}")
+        self._insufficient_resources_policy = policy
+        self._policy_fn = self._POLICY_FUNCTIONS[policy]
+
+    def load_data(self, data: "pd.DataFrame", copy: bool = False, dtype=np.float64):
+        """
+        Load the historic trade data. The dataframe must include OHLC and volume information as well as an index of type datetime.
+        A Polars DataFrame is accepted too, see _load_polars().
+        By default the dataframe is not copied, callers that modify it after loading must pass copy=True.
+        dtype sets the type of the OHLCV arrays, np.float32 halves their size for strategies that do
+        not need double precision. Cash and fill arithmetic stays float64.
+        """
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(f"Invalid dtype: {dtype}. Must be float32 or float64")
+        # indicators are computed again for the new data on first use
+        self._indicator_values = {}
+
+        if pl is not None and isinstance(data, pl.DataFrame):
+            self._load_polars(data, copy, dtype)
+            return
+
+        import pandas as pd
         if not isinstance(data, pd.DataFrame):
-            raise TypeError("Data must be a Pandas DataFrame")
+            raise TypeError("Data must be a Pandas or Polars DataFrame")
 
-        required_columns = {'open', 'high', 'low', 'close', 'volume'}
-        if not required_columns.issubset(data.columns):
-            raise KeyError(f"Data must contain the following columns: {required_columns}")
+        if not self.REQUIRED_COLUMNS.issubset(data.columns):
+            raise KeyError(f"Data must contain the following columns: {list(OHLCVView._fields)}")
 
         if not isinstance(data.index, pd.DatetimeIndex):
             try:
-                data.index = pd.to_datetime(data.index)
-            except Exception as e:
+                if data.index.dtype.kind in "iu":
+                    # integer indexes are epoch seconds
+                    index = pd.to_datetime(data.index, unit="s")
+                elif data.index.dtype.kind == "O":
+                    # ISO 8601 strings take the vectorized parser instead of per-element inference
+                    try:
+                        index = pd.to_datetime(data.index, format="ISO8601", cache=True)
+                    except ValueError:
+                        index = pd.to_datetime(data.index, cache=True)
+                else:
+                    index = pd.to_datetime(data.index)
+            except (TypeError, ValueError) as e:
                 raise ValueError("Index must be a datetime format.") from e
+            # shallow copy: shares the column buffers, leaves the caller's index untouched
+            data = data.copy(deep=False)
+            data.index = index
+
+        # unless asked for a copy keep a reference, the OHLCV buffers are shared with the caller
+        if copy:
+            data = data.copy()
+        self._data = data
+        # struct-of-arrays layout, one contiguous array per column and
+        # the bar timestamps as int64 nanoseconds since the epoch
+        self.ohlcv = {c: np.ascontiguousarray(data[c].to_numpy(), dtype=dtype) for c in OHLCVView._fields}
+        self.ts = data.index.as_unit("ns").asi8
+
+    def _load_polars(self, data, copy: bool = False, dtype=np.float64):
+        """
+        Load a Polars DataFrame. Polars frames have no index, the bar timestamps are taken from the
+        first Datetime or Date column. Columns of the requested dtype without nulls are shared with
+        the frame without a copy and are read-only unless copy=True.
+        """
+        if not self.REQUIRED_COLUMNS.issubset(data.columns):
+            raise KeyError(f"Data must contain the following columns: {list(OHLCVView._fields)}")
+        time_columns = [name for name, dtype in data.schema.items() if isinstance(dtype, (pl.Datetime, pl.Date))]
+        if not time_columns:
+            raise ValueError("Data must contain a Datetime or Date column.")
+
+        ts = data[time_columns[0]]
+        ts = ts.cast(pl.Datetime("ns")) if ts.dtype == pl.Date else ts.dt.cast_time_unit("ns")
+        self.ohlcv = {c: np.array(data[c].to_numpy(), dtype=dtype, order="C", copy=copy or None) for c in OHLCVView._fields}
+        self.ts = ts.to_physical().to_numpy()
+        # the pandas view is only built if something asks for it, see the data property
+        self._data = None
 
-        self.data = data.copy()
+    @property
+    def data(self):
+        """The DataFrame passed to load_data. Kept for compatibility, prefer ohlcv_arrays() in hot paths."""
+        if self._data is None:
+            # nothing loaded yet or loaded from Polars, build an equivalent pandas frame over the same arrays
+            import pandas as pd
+            self._data = pd.DataFrame(self.ohlcv, index=pd.DatetimeIndex(self.ts), copy=False)
+        return self._data
+
+    def ohlcv_arrays(self) -> OHLCVView:
+        """Return the open, high, low, close and volume columns as contiguous NumPy arrays, float64 unless load_data was given another dtype."""
+        return OHLCVView(**self.ohlcv)
+
+    def add_indicator(self, name: str, fn: Callable[["pd.DataFrame"], np.ndarray]):
+        """
+        Register an indicator computed from the whole loaded history at once, e.g.
+        bot.add_indicator("ema50", lambda df: df["close"].ewm(span=50).mean()), instead of
+        being recomputed by the strategy on every bar. fn receives the data DataFrame and returns
+        one value per bar. Registering a name again replaces the indicator.
+        """
+        self._indicators[name] = fn
+        self._indicator_values.pop(name, None)
+
+    def indicator(self, name: str) -> np.ndarray:
+        """
+        Return the values of a registered indicator as a NumPy array, one element per bar. They are
+        computed on the first call after load_data() and reused until other data is loaded.
+        """
+        values = self._indicator_values.get(name)
+        if values is None:
+            if name not in self._indicators:
+                raise KeyError(f"Unknown indicator: {name}. Must be one of {list(self._indicators)}")
+            values = np.ascontiguousarray(self._indicators[name](self.data))
+            if values.shape != self.ts.shape:
+                raise ValueError(f"Indicator {name} must have one value per bar, got {values.shape[0] if values.ndim else 0} for {self.ts.shape[0]} bars")
+            self._indicator_values[name] = values
+        return values
+
+    def window(self, ts, length: int) -> OHLCVView:
+        """
+        Return the last length bars up to and including time ts as views of the OHLCV arrays, no data is copied.
+        ts is a datetime or nanoseconds since the epoch. The bar is located by binary search on the bar timestamps,
+        so sliding-window strategies neither scan nor mask the whole history. Fewer bars are returned near the start.
+        """
+        if length <= 0:
+            raise ValueError(f"Invalid length: {length}. Must be greater than 0")
+        if isinstance(ts, np.datetime64):
+            ts = ts.astype("datetime64[ns]").astype(np.int64)
+        elif not isinstance(ts, (int, np.integer)):
+            # a timezone-aware ts is compared in UTC, like self.ts of timezone-aware data
+            ts = _datetime_to_ns(_as_datetime(ts))
+        end = int(np.searchsorted(self.ts, ts, side="right"))
+        start = max(end - length, 0)
+        return OHLCVView(**{c: self.ohlcv[c][start:end] for c in OHLCVView._fields})
+
+    def iter_bars(self, columns=OHLCVView._fields):
+        """
+        Iterate over the loaded bars as (ts, open, high, low, close, volume) tuples of Python scalars,
+        ts being nanoseconds since the epoch. Much faster than data.iterrows() in strategy loops;
+        strategies that can be expressed over whole arrays should use run_vectorized() instead.
+        Strategies that only use some of the columns can name them, e.g. columns=("close",) yields
+        (ts, close) tuples and skips converting the others.
+        """
+        unknown = set(columns).difference(self.REQUIRED_COLUMNS)
+        if unknown:
+            raise KeyError(f"Unknown columns: {sorted(unknown)}. Must be among {list(OHLCVView._fields)}")
+        return zip(self.ts.tolist(), *(self.ohlcv[c].tolist() for c in columns))
 
     def get_last_observed_exit_date(self):
         """Return the last observed exit date."""
-        return self.db.get_last_observed_exit_date()
+        with self.db.buffering(self._write_buffer):
+            return self.db.get_last_observed_exit_date()
 
     def load_position(self):
         """Load the latest open position for the ticker symbol from the database."""
-        self.position = self.db.get_last_position(self.name, self.ticker)
+        with self.db.buffering(self._write_buffer):
+            self.position = self.db.get_last_position(self.name, self.ticker)
 
     def get_position(self):
         """Return the current trade position for the ticker symbol"""
@@ -137,52 +361,136 @@ class TradeKitBot:
 
     def get_latest_open_position(self):
         """Return the latest open position for the ticker symbol from the database."""
-        return self.db.get_latest_open_position(self.name, self.ticker)
+        with self.db.buffering(self._write_buffer):
+            return self.db.get_latest_open_position(self.name, self.ticker)
 
     def run(self, strategy: Optional[Callable[['TradeKitBot'], None]] = None):
         """
         Loads the latest position from the database and runs the strategy. 
         The strategy object is a function that expects exactly one argument of type 
         TradeBot and returns nothing. 
+        In backtest mode the database reads and writes of the run are committed together, see TradeKitDB.transaction().
+        In live mode every write is committed on its own, the record of an order the broker has filled is kept
+        whatever happens later in the run.
         """
         if strategy:
             self.strategy = strategy
-            self.load_position()
-            self.strategy(self)
+            # a backtest has no side effect outside the database, its position read and order writes share
+            # one connection and commit once
+            transaction = self.db.transaction() if self.mode == "backtest" else contextlib.nullcontext()
+            with transaction:
+                self.load_position()
+                try:
+                    self.strategy(self)
+                finally:
+                    self.flush_orders()
+
+    def run_vectorized(self, kernel: Callable[..., np.ndarray], position_type: Literal["LONG","SHORT"] = "LONG"):
+        """
+        Runs a vectorized strategy over the whole loaded history. Only available in backtest mode.
+        The kernel receives the open, high, low, close, volume and timestamp arrays and returns one 
+        action per bar: 1 to buy, -1 to sell, 0 to hold. It can be a plain function or a numba 
+        @njit(cache=True) function. Alternatively it can return an (entries, exits) pair of boolean 
+        arrays marking the bars that open and close a position of the given type, an exit taking 
+        precedence over an entry on the same bar. An entry is only acted on 
+        while there is no open position and an exit only while there is one. Orders are filled at the 
+        close price of the bar, sized like buy() and sell(), and an exit closes the whole position.
+        The fills are simulated in one call to a compiled kernel, recorded in self.positions, a 
+        PositionTable, and written to the database in one batch at the end of the run.
+        """
+        if self.mode != "backtest":
+            raise RuntimeError("run_vectorized is only available in backtest mode")
+
+        o, h, l, c, v = self.ohlcv_arrays()
+        entry = BUY if position_type == "LONG" else SELL
+        result = kernel(o, h, l, c, v, self.ts)
+        if isinstance(result, tuple):
+            if len(result) != 2:
+                raise ValueError(f"Kernel must return an action array or an (entries, exits) pair, got {len(result)} arrays")
+            entries, exits = (np.asarray(mask, dtype=np.bool_) for mask in result)
+            if entries.shape != exits.shape:
+                raise ValueError(f"Entries and exits must have the same length, got {entries.shape[0]} and {exits.shape[0]}")
+            actions = np.where(exits, -entry, np.where(entries, entry, 0)).astype(np.int8)
+        else:
+            actions = np.asarray(result, dtype=np.int8)
+        if actions.shape != c.shape:
+            raise ValueError(f"Kernel must return one action per bar, got {actions.shape[0]} for {c.shape[0]} bars")
+
+        # the fill arithmetic is done in float64 whatever dtype the data was loaded with
+        c = np.asarray(c, dtype=np.float64)
+        self.load_position()
+        table = PositionTable(self.name, self.ticker)
+        self.positions = table
+        broker = self.broker
+        start = 0
+        try:
+            # a position left open by an earlier run is closed through the regular order path
+            if self.position is not None and self.position.status == "OPEN":
+                exits = np.flatnonzero(actions == -entry)
+                if exits.shape[0] == 0:
+                    return
+                i = exits[0]
+                place = self.sell if position_type == "LONG" else self.buy
+                place(position_type=position_type, price=float(c[i]), observed_date=_datetime_from_ns(self.ts[i]))
+                start = i + 1
+
+            count, cash, holdings, entry_bar, exit_bar, quantity, error, bar = backtest_kernel(
+                c[start:], actions[start:], entry, float(broker.cash), float(broker.asset_holdings),
+                self._buy_budget_factor, self._sell_ratio, POLICY_CODES[self.insufficient_resources_policy]
+            )
+            broker.cash = cash
+            broker.asset_holdings = int(holdings) if isinstance(broker.asset_holdings, int) else holdings
+            entry_bar += start
+            closed = exit_bar >= 0
+            exit_bar = np.where(closed, exit_bar + start, 0)
+            table.extend(position_type, quantity, c[entry_bar], self.ts[entry_bar], c[exit_bar], self.ts[exit_bar], closed)
+
+            if error == INSUFFICIENT_RESOURCES:
+                # the kernel stopped at an entry it could not size, raise as the halt policy does
+                self.enforce_quantity_policy(0, trade_type="buy" if position_type == "LONG" else "sell")
+            elif error == INSUFFICIENT_FUNDS:
+                raise ValueError("Insufficient funds to execute the buy order.")
+        finally:
+            positions = table.positions()
+            if positions:
+                table.id[:len(positions)] = self.db.bulk_load_positions(positions)
+                self.position = positions[-1]
+            self.flush_orders()
+
+    def flush_orders(self):
+        """Write the positions buffered during a backtest to the database. In live mode writes are not buffered and this is a no-op."""
+        self.db.flush(self._write_buffer)
 
     def enforce_quantity_policy(self, quantity: int, trade_type: str) -> int:
         """It's not recommended to call this method directly. It is used internally to enforce the quantity policy."""
-        if quantity > 0:
-            return quantity
-
-        policy = self.insufficient_resources_policy
-        if policy == "adjust":
-            return 0
-        elif policy == "skip":
-            return 0
-        elif policy == "halt":
-            raise RuntimeError(f"Cannot execute {trade_type} trade: insufficient resources.")
-        else:
-            raise ValueError(f"Invalid insufficient_resources_policy: {policy}")
+        return quantity if quantity > 0 else self._policy_fn(trade_type)
 
     def calculate_buy_quantity(self, price: float) -> int:
         """Determine how many shares to buy based on available cash and aggressiveness level."""
-        ratio = self.buy_aggressiveness_levels[self.buy_aggressiveness]
-        budget = self.broker.cash * ratio
-        budget_after_commission = budget * (1 - self.broker.commission)
-        quantity = int(budget_after_commission / price)
-        return self.enforce_quantity_policy(quantity, trade_type="buy")
+        return self.enforce_quantity_policy(int(self.broker.cash * self._buy_budget_factor / price), trade_type="buy")
+
+    def calculate_buy_quantity_batch(self, prices, cash=None) -> np.ndarray:
+        """
+        Vectorized calculate_buy_quantity(), the number of shares each price buys with the matching cash
+        balance, computed in one NumPy pass. cash defaults to the broker's cash for every price.
+        """
+        prices = np.asarray(prices, dtype=np.float64)
+        cash = self.broker.cash if cash is None else np.asarray(cash, dtype=np.float64)
+        quantities = (cash * self._buy_budget_factor / prices).astype(np.int64)
+        if not quantities.all():
+            # raises under the 'halt' policy, the other policies leave the zeros as they are
+            self.enforce_quantity_policy(0, trade_type="buy")
+        return quantities
 
     def calculate_sell_quantity(self) -> int:
         """Determine how many shares to sell based on position size and sell aggressiveness level."""
         if self.position is None and self.broker.asset_holdings == 0:
             raise RuntimeError("No open position to sell.")
-        ratio = self.sell_aggressiveness_levels[self.sell_aggressiveness]
         q = self.position.quantity if self.position else self.broker.asset_holdings
-        quantity = int(q * ratio)
+        quantity = int(q * self._sell_ratio)
         return self.enforce_quantity_policy(quantity, trade_type="sell")
 
-    def buy(self, position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[str] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
+    def buy(self, position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[Union[str, datetime]] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
         """Place a buy order. Returns the number of assets bought or None if no assets were bought."""
         return self.place_order(   
             action="BUY",
@@ -193,7 +501,7 @@ class TradeKitBot:
             take_profit=take_profit
         )
 
-    def sell(self, position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[str] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
+    def sell(self, position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[Union[str, datetime]] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
         """Place a sell order. Returns the number of assets sold or None if no assets were sold."""
         return self.place_order(
             action="SELL",
@@ -204,12 +512,19 @@ class TradeKitBot:
             take_profit=take_profit
         )
 
-    def place_order(self, action: Literal["BUY","SELL"], position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[str] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
+    def place_order(self, action: Literal["BUY","SELL"], position_type: Literal["LONG","SHORT"], price: float, observed_date: Optional[Union[str, datetime]] = None, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
         """Place a buy or sell order. It's not recommended to call this method directly."""
         if price <= 0:
             raise ValueError("Price must be greater than 0")
 
+        if observed_date is not None:
+            # e.g. an ISO string or a numpy datetime64, the position dates must be datetimes
+            observed_date = _as_datetime(observed_date)
+        if self.mode == "backtest":
+            self._bar_time = observed_date
+
         quantity = self.calculate_buy_quantity(price) if action == "BUY" else self.calculate_sell_quantity()
+        # skipped orders leave self.position untouched and never reach the database
         if quantity == 0 and self.insufficient_resources_policy == "skip":
             return
 
@@ -221,6 +536,8 @@ class TradeKitBot:
                 position_type=position_type,
                 quantity=quantity,
                 observed_entry_date=observed_date,
+                # backtest orders are submitted at the bar time, None in live mode so the position reads the clock
+                entry_submit_date=self._bar_time,
                 entry_submit_price=price,
                 stop_loss=stop_loss,
                 take_profit=take_profit,
@@ -232,28 +549,27 @@ class TradeKitBot:
             self.position.observed_exit_date = observed_date
 
         try:
-            executed_quantity = self.submit_order(position_type=position_type, price=price)
-            self.position.quantity -= executed_quantity
-            return executed_quantity
+            # the writes of the order, also those of the broker, go to the bot's buffer in backtests
+            with self.db.buffering(self._write_buffer):
+                return self.submit_order(position_type=position_type, price=price)
         except Exception as e:
             raise RuntimeError(f"Error placing {action} order: {e}")
 
     def submit_order(self, position_type: str, price: float)->int:
         """ Based on the position and order types, either update the database or create a new entry"""
-        action = self.position.action
-        position_type = self.position.position_type
+        self._submit_dispatch[(self.position.action, self.position.position_type)](price)
 
-        if action == "BUY" and position_type == "LONG":
-            self.position.id = self.db.create_position(self.position)
-        elif action == "BUY" and position_type == "SHORT":
-            self.position.exit_submit_price = price
-            self.db.update_position(self.position)
-        elif action == "SELL" and position_type == "LONG":
-            self.position.exit_submit_price = price
-            self.db.update_position(self.position)
-        elif action == "SELL" and position_type == "SHORT":
+        # execute the order
+        return self.broker.execute_order(trade_position=self.position, ts=self._bar_time)
+
+    def _submit_create(self, price: float):
+        """Opening order, insert the new position. Market orders are filled right away and inserted by the broker in their filled state."""
+        if self.position.order_type != "MARKET":
             self.position.id = self.db.create_position(self.position)
 
-        # execute the order
-        return self.broker.execute_order(trade_position=self.position)    
+    def _submit_update_with_exit(self, price: float):
+        """Closing order, record the exit price on the existing position. Market orders are written by the broker once filled."""
+        self.position.exit_submit_price = price
+        if self.position.order_type != "MARKET":
+            self.db.update_position(self.position)
 
@@ -1,11 +1,21 @@
 from datetime import datetime
-import pandas as pd
-from typing import Optional
+from typing import Callable, Optional
 from .models import TradeKitPosition
 from .database import TradeKitDB
 import logging
+import weakref
 
 class TradeKitBroker:
+    # (action, position_type) -> whether the order opens the position, a closing order fills at the exit price
+    _OPENS_POSITION = {
+        ("BUY", "LONG"): True,
+        ("BUY", "SHORT"): False,
+        ("SELL", "LONG"): False,
+        ("SELL", "SHORT"): True
+    }
+    # statuses a position can be in for an order to be executed
+    EXECUTABLE_STATUSES = frozenset(("PENDING", "OPEN"))
+
     def __init__(self, db: TradeKitDB):
         """
         Initialize the TradeKitBroker with a database connection.
@@ -16,7 +26,11 @@ class TradeKitBroker:
         self.active_position = None
         self.cash = 0.0
         self.asset_holdings = 0
+        # bots trading through this broker, notified when the commission changes
+        self._bots = weakref.WeakSet()
         self.commission = 0.0
+        # clock used to stamp orders executed without an explicit timestamp, see execute_order()
+        self.now_fn: Callable[[], datetime] = datetime.now
         # set-up the logger
         self.logger = logging.getLogger(__name__)
         if not self.logger.handlers:
@@ -26,6 +40,17 @@ class TradeKitBroker:
             self.logger.addHandler(handler)
         self.logger.propagate = False
 
+    @property
+    def commission(self) -> float:
+        """Commission charged by the broker as a fraction of the order value."""
+        return self._commission
+
+    @commission.setter
+    def commission(self, value: float):
+        self._commission = value
+        for bot in self._bots:
+            bot._update_buy_budget_factor()
+
     def statement(self):
         return {
             "cash": self.cash,
@@ -45,80 +70,73 @@ class TradeKitBroker:
             raise ValueError("Funding amount must be positive.")
         self.asset_holdings += amount
 
-    def execute_order(self, trade_position: TradeKitPosition):
-        """Execute the given order and update its status."""
+    def execute_order(self, trade_position: TradeKitPosition, ts: Optional[datetime] = None):
+        """
+        Execute the given order and update its status.
+        :param ts: Time the order is submitted and filled at, backtests pass the bar time. Read once from now_fn() if not given.
+        """
         self.active_position = trade_position
+        if ts is None:
+            ts = self.now_fn()
 
-        if self.active_position.status not in {"PENDING", "OPEN"}:
+        if self.active_position.status not in self.EXECUTABLE_STATUSES:
             raise ValueError(f"Order for position id: {self.active_position.id} is not in PENDING or OPEN status")
 
         try:
-            self._submit_order_to_broker()
-            self._finalize_order_execution()
+            self._submit_order_to_broker(ts)
+            self._finalize_order_execution(ts)
         except Exception as e:
-            self.logger.error(f"Error executing order for position id: {self.active_position.id}. Error: {e}")
+            self.logger.error("Error executing order for position id: %s. Error: %s", self.active_position.id, e)
             raise RuntimeError(f"Error executing order for position id: {self.active_position.id}. Error: {e}")
         return self.active_position.quantity
 
-    def _submit_order_to_broker(self):
+    def _submit_order_to_broker(self, ts: datetime):
         """Submit the order to the broker API."""
         self.active_position.status = "PENDING"
         if self.active_position.action == "BUY":
-            self.active_position.entry_submit_date = datetime.now()
+            self.active_position.entry_submit_date = ts
         elif self.active_position.action == "SELL":
-            self.active_position.exit_submit_date = datetime.now()
-        self.db.update_position(self.active_position)
+            self.active_position.exit_submit_date = ts
+        # a market order is filled right away, the write made once it is filled supersedes this one.
+        # Buffered writes coalesce with the later one anyway
+        if self.active_position.order_type != "MARKET":
+            self.db.update_position(self.active_position)
 
-    def _finalize_order_execution(self):
+    def _finalize_order_execution(self, ts: datetime):
         """Finalize the order execution."""
-        if self.active_position.action == "BUY":
-            self._handle_buy_execution()
-        elif self.active_position.action == "SELL":
-            self._handle_sell_execution()
+        position = self.active_position
+        opens = self._OPENS_POSITION[(position.action, position.position_type)]
+        price = position.entry_submit_price if opens else position.exit_submit_price
+        if position.action == "BUY":
+            self._handle_buy_execution(price)
+        else:
+            self._handle_sell_execution(price)
 
-    def _handle_buy_execution(self):
-        """Handle BUY order execution."""
-        if self.active_position.position_type == "SHORT":
-            p = self.active_position.exit_submit_price
+        if opens:
+            position.status = "OPEN"
+            position.entry_date = ts
+            position.entry_price = price
         else:
-            p = self.active_position.entry_submit_price
-        cost = p * self.active_position.quantity
-        self.cash -= cost
-        if self.cash < 0:
-            self.cash += cost
+            position.status = "CLOSED"
+            position.exit_date = ts
+            position.exit_price = price
+        if position.id is None:
+            # not stored yet, a single INSERT writes the filled position
+            position.id = self.db.create_position(position)
+        else:
+            self.db.update_position(position)
+
+    def _handle_buy_execution(self, price: float):
+        """Handle BUY order execution."""
+        cost = price * self.active_position.quantity
+        if cost > self.cash:
             raise ValueError("Insufficient funds to execute the buy order.")
+        self.cash -= cost
         self.asset_holdings += self.active_position.quantity
 
-        if self.active_position.position_type == "LONG":
-            self.active_position.status = "OPEN"
-            self.active_position.entry_date = datetime.now()
-            self.active_position.entry_price = self.active_position.entry_submit_price
-        elif self.active_position.position_type == "SHORT":
-            self.active_position.status = "CLOSED"
-            self.active_position.exit_date = datetime.now()
-            self.active_position.exit_price = self.active_position.exit_submit_price
-        self.db.update_position(self.active_position)
-
-    def _handle_sell_execution(self):
+    def _handle_sell_execution(self, price: float):
         """Handle SELL order execution."""
-        if self.active_position.position_type == "LONG":
-            p = self.active_position.exit_submit_price
-        else:
-            p = self.active_position.entry_submit_price
-        proceeds = p * self.active_position.quantity
-        self.asset_holdings -= self.active_position.quantity
-        if self.asset_holdings < 0:
-            self.asset_holdings += self.active_position.quantity
+        if self.active_position.quantity > self.asset_holdings:
             raise ValueError("Insufficient shares to execute the sell order.")
-        self.cash += proceeds
-
-        if self.active_position.position_type == "LONG":
-            self.active_position.status = "CLOSED"
-            self.active_position.exit_date = datetime.now()
-            self.active_position.exit_price = self.active_position.exit_submit_price
-        elif self.active_position.position_type == "SHORT":
-            self.active_position.status = "OPEN"
-            self.active_position.entry_date = datetime.now()
-            self.active_position.entry_price = self.active_position.entry_submit_price
-        self.db.update_position(self.active_position)
-
+        self.asset_holdings -= self.active_position.quantity
+        self.cash += price * self.active_position.quantity
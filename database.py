@@ -1,24 +1,263 @@
+import asyncio
+import contextlib
+import contextvars
+import copy
+import os
+import threading
+import time
+import weakref
+from dataclasses import fields
+from datetime import datetime
 import psycopg
-from psycopg.rows import dict_row
+from psycopg import sql
+from psycopg.adapt import AdaptersMap
+from psycopg.conninfo import make_conninfo
+from psycopg.pq import TransactionStatus
+from psycopg.rows import class_row, dict_row
+from psycopg.types.numeric import FloatLoader
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
 from .models import TradeKitPosition
 import logging
 
+class _WriteBuffer:
+    """Position writes held back until they are flushed, see TradeKitDB.write_buffer()."""
+    __slots__ = ("creates", "updates", "__weakref__")
+
+    def __init__(self):
+        # id(position) -> position not inserted yet, position id -> stored position to update
+        self.creates = {}
+        self.updates = {}
+
+    def __len__(self):
+        return len(self.creates) + len(self.updates)
+
+# returned by TradeKitDB._cache_get() when the key isn't cached, None is a valid cached read
+_MISS = object()
+
+# the price columns are NUMERIC, read them as the floats TradeKitPosition declares instead of Decimal,
+# which is slower to decode and doesn't mix with the float arithmetic of the broker
+_ADAPTERS = AdaptersMap(psycopg.adapters)
+_ADAPTERS.register_loader("numeric", FloatLoader)
+
 class TradeKitDB:
-    def __init__(self, db_name, user, password, host="localhost", port=5432):
+    # attributes of TradeKitPosition, in declaration order, mapped one to one onto the trades columns
+    POSITION_FIELDS = tuple(field.name for field in fields(TradeKitPosition))
+    INSERT_COLUMNS = tuple(field for field in POSITION_FIELDS if field != "id")
+
+    # schema created by create_table()
+    CREATE_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS trades (
+        id SERIAL PRIMARY KEY,
+        bot_name VARCHAR(50) NOT NULL,
+        ticker VARCHAR(30) NOT NULL,
+        stop_loss NUMERIC(10,2) NULL,
+        take_profit NUMERIC(10,2) NULL,
+        observed_entry_date TIMESTAMP NULL,
+        observed_exit_date TIMESTAMP NULL,
+        position_type VARCHAR(5) CHECK (position_type IN ('LONG', 'SHORT')) NOT NULL DEFAULT 'LONG',
+        quantity INT NOT NULL,
+        action VARCHAR(4) CHECK (action IN ('BUY', 'SELL')) NOT NULL,
+        entry_submit_date TIMESTAMP NULL,
+        entry_submit_price NUMERIC(10,2) NOT NULL,
+        entry_date TIMESTAMP NULL,
+        entry_price NUMERIC(10, 2) NULL,
+        exit_submit_date TIMESTAMP NULL,
+        exit_submit_price NUMERIC(10,2) NULL,
+        exit_date TIMESTAMP NULL,
+        exit_price NUMERIC(10, 2) NULL,
+        exit_reason VARCHAR(50) NULL CHECK (exit_reason IN ('TECHNICAL', 'STOP_LOSS', 'TAKE_PROFIT', 'MANUAL', 'TIMEOUT', 'SIGNAL', 'OTHER')),
+        trigger VARCHAR(50) NULL,
+        order_type VARCHAR(6) CHECK (order_type IN ('LIMIT', 'MARKET')) NOT NULL DEFAULT 'MARKET',
+        status VARCHAR(9) CHECK (status IN ('PENDING', 'OPEN', 'PARTIAL', 'CLOSED', 'CANCELED', 'FAILED')) NOT NULL
+    );
+    """
+    # held by the transaction creating the schema, processes starting together run the DDL one at a time
+    SCHEMA_LOCK_QUERY = "SELECT pg_advisory_xact_lock(hashtext('tradekit_trades_schema'));"
+
+    # let the position lookups read the newest matching row from an index instead of sorting the matches
+    CREATE_INDEX_QUERIES = (
+        # get_latest_open_position()
+        """
+        CREATE INDEX IF NOT EXISTS idx_trades_open_entry_date
+        ON trades (bot_name, ticker, entry_date DESC) WHERE status = 'OPEN';
+        """,
+        # get_last_position()
+        """
+        CREATE INDEX IF NOT EXISTS idx_trades_bot_ticker_id
+        ON trades (bot_name, ticker, id DESC);
+        """,
+        # get_last_observed_exit_date()
+        """
+        CREATE INDEX IF NOT EXISTS idx_trades_closed_exit_date
+        ON trades (observed_exit_date DESC) WHERE status = 'CLOSED';
+        """
+    )
+
+    # notify NOTIFY_CHANNEL with "<bot_name>|<ticker>" whenever positions are written, by any client,
+    # so a TradeKitDB created with listen=True can drop its cached reads of that bot and ticker, see _listen().
+    # The triggers fire once per statement with the written rows as a transition table, a COPY or a
+    # batched UPDATE sends one notification per bot and ticker rather than one per row
+    NOTIFY_CHANNEL = "trades_changed"
+    CREATE_TRIGGER_QUERIES = (
+        f"""
+        CREATE OR REPLACE FUNCTION trades_notify() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify('{NOTIFY_CHANNEL}', payload)
+            FROM (SELECT DISTINCT bot_name || '|' || ticker AS payload FROM changed) AS written;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+        """,
+        """
+        DO $$
+        BEGIN
+            -- row level trigger of earlier versions
+            IF EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trades_notify' AND tgrelid = 'trades'::regclass) THEN
+                DROP TRIGGER trades_notify ON trades;
+            END IF;
+            -- a trigger with transition tables handles a single event
+            IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'trades_notify_insert' AND tgrelid = 'trades'::regclass) THEN
+                CREATE TRIGGER trades_notify_insert AFTER INSERT ON trades
+                REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION trades_notify();
+                CREATE TRIGGER trades_notify_update AFTER UPDATE ON trades
+                REFERENCING NEW TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION trades_notify();
+                CREATE TRIGGER trades_notify_delete AFTER DELETE ON trades
+                REFERENCING OLD TABLE AS changed FOR EACH STATEMENT EXECUTE FUNCTION trades_notify();
+            END IF;
+        END;
+        $$;
+        """
+    )
+
+    # everything create_table() runs, sent as one multi-statement script in a single round-trip
+    SCHEMA_SCRIPT = "".join((SCHEMA_LOCK_QUERY, CREATE_TABLE_QUERY) + CREATE_INDEX_QUERIES + CREATE_TRIGGER_QUERIES)
+
+    # statements run on every order or bar, prepared by the server on first use
+    INSERT_POSITION_QUERY = f"""
+        INSERT INTO trades ({", ".join(INSERT_COLUMNS)})
+        VALUES ({", ".join(f"%({column})s" for column in INSERT_COLUMNS)})
+        RETURNING id;
+        """
+
+    # updates a position, fields left NULL, i.e. None, keep their value. A batch runs it with executemany(),
+    # pipelined in one round-trip, and the values are sent with the same types as those of INSERT_POSITION_QUERY
+    UPDATE_POSITION_QUERY = sql.SQL("""
+        UPDATE trades
+        SET {}
+        WHERE id = %(id)s
+        """).format(sql.SQL(", ").join(
+            sql.SQL("{0} = COALESCE({1}, {0})").format(sql.Identifier(column), sql.Placeholder(column)) for column in INSERT_COLUMNS
+        ))
+
+    # bulk loads reserve the ids of the rows first, COPY does not return them
+    RESERVE_IDS_QUERY = """
+        SELECT nextval(pg_get_serial_sequence('trades', 'id')) AS id
+        FROM generate_series(1, %s)
+        ORDER BY id;
         """
-        Initialize the database connection and create the trades table if it doesn't exist.
+
+    COPY_POSITIONS_QUERY = f"COPY trades (id, {', '.join(INSERT_COLUMNS)}) FROM STDIN"
+
+    LATEST_OPEN_POSITION_QUERY = """
+        SELECT id, bot_name, ticker, stop_loss, take_profit, observed_entry_date, observed_exit_date, position_type,  
+            quantity, action, entry_submit_date, entry_submit_price, entry_date, entry_price, 
+            exit_submit_date, exit_submit_price, exit_date, exit_price, exit_reason, trigger,
+            order_type, status
+        FROM trades
+        WHERE bot_name = %s AND ticker = %s AND status = 'OPEN'
+        ORDER BY entry_date DESC
+        LIMIT 1;
+        """
+
+    LAST_POSITION_QUERY = """
+        SELECT id, bot_name, ticker, stop_loss, take_profit, observed_entry_date, observed_exit_date, position_type, 
+            quantity, action, entry_submit_date, entry_submit_price, entry_date, entry_price, 
+            exit_submit_date, exit_submit_price, exit_date, exit_price, exit_reason,
+            order_type, status
+        FROM trades
+        WHERE bot_name = %s AND ticker = %s
+        ORDER BY id DESC
+        LIMIT 1;
+        """
+
+    LAST_OBSERVED_EXIT_DATE_QUERY = """
+        SELECT observed_exit_date 
+        FROM trades 
+        WHERE status = 'CLOSED' 
+        ORDER BY observed_exit_date DESC 
+        LIMIT 1;
+        """
+
+    # buffered writes are flushed once this many positions are pending in a buffer, see buffer_writes and write_buffer()
+    WRITE_BUFFER_SIZE = 1000
+
+    # instance shared by the process, see get_default()
+    _default = None
+    _default_lock = threading.Lock()
+    # (host, port, db_name) of the databases whose schema this process has created, see _ensure_schema()
+    _schema_ready = set()
+    _schema_lock = threading.Lock()
+
+    def __init__(self, db_name, user, password, host="localhost", port=5432, min_size=2, max_size=10, cache_ttl=0, init_schema=True, listen=False):
+        """
+        Initialize the database connection pool and create the trades table if it doesn't exist.
         :param db_name: Name of the database.
         :param user: Database user.
         :param password: Database password.
         :param host: Database host (default is localhost).
         :param port: Database port (default is 5432).
+        :param min_size: Number of connections the pool keeps open (default is 2).
+        :param max_size: Maximum number of connections the pool opens (default is 10).
+        :param cache_ttl: Seconds a position read is served from memory, 0 disables the cache (default is 0). Writes made through
+            this instance drop the affected reads, writes of other processes are only seen once the reads expire unless listen is True.
+        :param init_schema: Create the trades table and its indexes if this process hasn't yet (default is True). Processes started after
+            the schema is in place, e.g. backtest workers, can pass False to skip the DDL round-trips.
+        :param listen: Drop cached reads as soon as other processes write the positions, over a dedicated connection listening
+            on NOTIFY_CHANNEL (default is False). Otherwise their writes are seen once the cached reads expire after cache_ttl.
         """
+        self._setup(db_name, user, password, host, port, min_size, max_size, cache_ttl, init_schema, listen)
+        self.logger.debug("Logger initialized")
+        self.connect()
+        if init_schema:
+            self._ensure_schema()
+
+    def _setup(self, db_name, user, password, host, port, min_size, max_size, cache_ttl, init_schema, listen):
+        """Set the connection parameters and the state shared by TradeKitDB and AsyncTradeKitDB, the pool is opened by connect()."""
         self.db_name = db_name
         self.user = user
         self.password = password
         self.host = host
         self.port = port
-        self.conn = None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.init_schema = init_schema
+        self._setup_state(cache_ttl, listen)
+
+    def _setup_state(self, cache_ttl, listen):
+        """Set the buffers, cache, listener and transaction state and the logger, shared by every TradeKitDB class."""
+        self.pool = None
+        # when enabled, position writes are kept in memory until flush() is called or WRITE_BUFFER_SIZE are pending
+        self.buffer_writes = False
+        self._buffer = _WriteBuffer()
+        # buffers handed out by write_buffer(), and the one the writes of the current thread or task go to
+        self._buffers = weakref.WeakSet()
+        self._active_buffer = contextvars.ContextVar("tradekit_write_buffer", default=None)
+        # (query, bot_name, ticker) -> (expiry, value), dropped whenever a position of the bot and ticker is written.
+        # The listener thread evicts entries too, every change to the dict is made holding _cache_lock and bumps
+        # _cache_generation, so a read that raced with an eviction isn't cached
+        self.cache_ttl = cache_ttl
+        self._position_cache = {}
+        self._cache_lock = threading.Lock()
+        self._cache_generation = 0
+        self._cache_hits = 0
+        self._cache_misses = 0
+        # thread or task evicting the cached reads written by other processes, see _listen()
+        self.listen = listen
+        self._listener = None
+        self._listener_conn = None
+        self._listener_stop = threading.Event()
+        # connection of the enclosing transaction() block, per thread and per asyncio task
+        self._transaction_conn = contextvars.ContextVar("tradekit_transaction_conn", default=None)
         # set-up the logger
         self.logger = logging.getLogger(__name__)
         if not self.logger.handlers:
@@ -28,238 +267,770 @@ class TradeKitDB:
             self.logger.addHandler(handler)
         self.logger.propagate = False
 
-        self.logger.debug("Logger initialized")
-        self.connect()
-        self.create_table()
+    @staticmethod
+    def _default_params():
+        """Constructor arguments of the shared instance, read from the standard PostgreSQL environment variables."""
+        return {
+            "db_name": os.environ.get("PGDATABASE", "postgres"),
+            "user": os.environ.get("PGUSER", "postgres"),
+            "password": os.environ.get("PGPASSWORD", ""),
+            "host": os.environ.get("PGHOST", "localhost"),
+            "port": int(os.environ.get("PGPORT", 5432)),
+        }
+
+    @classmethod
+    def get_default(cls):
+        """
+        Return the TradeKitDB shared by the process, created on first use from the standard PostgreSQL
+        environment variables PGDATABASE, PGUSER, PGPASSWORD, PGHOST and PGPORT. Its pool is opened and
+        filled before it is returned, bots and brokers should share it rather than open pools of their own.
+        """
+        with cls._default_lock:
+            if cls._default is None or cls._default.pool is None:
+                cls._default = cls(**cls._default_params())
+            return cls._default
+
+    def _conninfo(self):
+        return make_conninfo(
+            dbname=self.db_name,
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port
+        )
+
+    def _pool_args(self, conninfo):
+        """Arguments of the connection pool, of ConnectionPool and AsyncConnectionPool alike."""
+        return {
+            "conninfo": conninfo,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            # fetch results as dictionaries, prepare statements the first time they are executed
+            "kwargs": {"row_factory": dict_row, "prepare_threshold": 0, "context": _ADAPTERS},
+        }
 
     def connect(self):
-        """Establish database connection."""
+        """Open the connection pool. Broken connections are replaced by the pool."""
+        conninfo = self._conninfo()
+        pool = ConnectionPool(**self._pool_args(conninfo), open=True)
         try:
-            self.conn = psycopg.connect(
-                dbname=self.db_name,
-                user=self.user,
-                password=self.password,
-                host=self.host,
-                port=self.port,
-                row_factory=dict_row  # fetch results as dictionaries
-            )
-        except psycopg.Error as e:
-            self.conn = None  # ensure conn is unset or cleared on failure
-            self.logger.debug(f"Error connecting to database: {e}")
+            # fail here rather than on the first query if the database cannot be reached
+            pool.wait()
+        except Exception as e:
+            pool.close()
+            self.logger.debug("Error connecting to database: %s", e)
             raise
-        self.logger.debug(f"Database connection established.")
+        self.pool = pool
+        self.logger.debug("Database connection pool established.")
+        if self.listen and self.cache_ttl > 0:
+            self._start_listener(conninfo)
+
+    def _start_listener(self, conninfo):
+        """Open a connection listening on NOTIFY_CHANNEL and start the thread reading its notifications."""
+        conn = psycopg.connect(conninfo, autocommit=True)
+        conn.execute(f"LISTEN {self.NOTIFY_CHANNEL}")
+        self._listener_conn = conn
+        self._listener_stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="tradekit-cache-listener", daemon=True)
+        self._listener.start()
+
+    def _listen(self):
+        """Drop the cached reads of the bot and ticker of every notification until close() is called."""
+        try:
+            while not self._listener_stop.is_set():
+                # wake up regularly to notice close()
+                for notify in self._listener_conn.notifies(timeout=0.5):
+                    bot_name, _, ticker = notify.payload.partition("|")
+                    self._evict(bot_name, ticker)
+        except psycopg.Error as e:
+            # the cache keeps expiring after cache_ttl, only writes of other processes go unnoticed until then
+            self.logger.debug("Position cache listener stopped: %s", e)
+
+    def _stop_listener(self):
+        if self._listener is not None:
+            self._listener_stop.set()
+            self._listener.join()
+            self._listener_conn.close()
+            self._listener = None
+            self._listener_conn = None
+
+    def _ensure_schema(self):
+        """Run create_table() the first time the process connects to a database, later instances skip the DDL."""
+        key = (self.host, self.port, self.db_name)
+        with self._schema_lock:
+            if key not in self._schema_ready:
+                self.create_table()
+                self._schema_ready.add(key)
+
+    def _connection(self):
+        """
+        Borrow a connection from the pool. The transaction is committed when the block exits and rolled back on error.
+        Inside transaction() the connection of the block is returned instead and the statements join its transaction.
+        """
+        conn = self._transaction_conn.get()
+        if conn is not None:
+            return contextlib.nullcontext(conn)
+        return self.pool.connection()
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Run the statements issued inside the block on one connection and commit them once when the block
+        exits, instead of borrowing a connection and committing for every read and write. A failed statement
+        rolls the transaction back, also when the error is caught or wrapped in another exception inside the
+        block, e.g. the RuntimeError of TradeKitBroker.execute_order(). Other exceptions, e.g. raised by a
+        strategy, commit the statements run so far, as they would have been committed without the block,
+        and are re-raised. Nested blocks join the outer one.
+        """
+        if self._transaction_conn.get() is not None:
+            yield
+            return
+        with self.pool.connection() as conn:
+            token = self._transaction_conn.set(conn)
+            try:
+                yield
+            except BaseException as e:
+                if isinstance(e, Exception) and not self._transaction_failed(conn, e):
+                    conn.commit()
+                else:
+                    # rolled back by the pool, reads cached inside the block may hold rolled back rows
+                    self._drop_cache()
+                raise
+            else:
+                if self._transaction_failed(conn):
+                    conn.rollback()
+                    self._drop_cache()
+                    raise RuntimeError("Transaction rolled back, a statement executed inside the block failed.")
+            finally:
+                self._transaction_conn.reset(token)
+
+    @staticmethod
+    def _transaction_failed(conn, error=None) -> bool:
+        """Whether the transaction of conn can no longer be committed, COMMIT would silently roll it back."""
+        # a failed statement leaves the transaction in error whatever exception the caller turned the error into
+        return isinstance(error, psycopg.Error) or conn.info.transaction_status in (TransactionStatus.INERROR, TransactionStatus.UNKNOWN)
 
     def create_table(self):
         """Create a trades table if it doesn't exist."""
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS trades (
-            id SERIAL PRIMARY KEY,
-            bot_name VARCHAR(50) NOT NULL,
-            ticker VARCHAR(30) NOT NULL,
-            stop_loss NUMERIC(10,2) NULL,
-            take_profit NUMERIC(10,2) NULL,
-            observed_entry_date TIMESTAMP NULL,
-            observed_exit_date TIMESTAMP NULL,
-            position_type VARCHAR(5) CHECK (position_type IN ('LONG', 'SHORT')) NOT NULL DEFAULT 'LONG',
-            quantity INT NOT NULL,
-            action VARCHAR(4) CHECK (action IN ('BUY', 'SELL')) NOT NULL,
-            entry_submit_date TIMESTAMP NULL,
-            entry_submit_price NUMERIC(10,2) NOT NULL,
-            entry_date TIMESTAMP NULL,
-            entry_price NUMERIC(10, 2) NULL,
-            exit_submit_date TIMESTAMP NULL,
-            exit_submit_price NUMERIC(10,2) NULL,
-            exit_date TIMESTAMP NULL,
-            exit_price NUMERIC(10, 2) NULL,
-            exit_reason VARCHAR(50) NULL CHECK (exit_reason IN ('TECHNICAL', 'STOP_LOSS', 'TAKE_PROFIT', 'MANUAL', 'TIMEOUT', 'SIGNAL', 'OTHER')),
-            trigger VARCHAR(50) NULL,
-            order_type VARCHAR(6) CHECK (order_type IN ('LIMIT', 'MARKET')) NOT NULL DEFAULT 'MARKET',
-            status VARCHAR(9) CHECK (status IN ('PENDING', 'OPEN', 'PARTIAL', 'CLOSED', 'CANCELED', 'FAILED')) NOT NULL
-        );
+        with self._connection() as conn, conn.cursor() as cur:
+            # without parameters nor preparation the script goes out as a simple query, which may hold several statements
+            cur.execute(self.SCHEMA_SCRIPT, prepare=False)
+
+    def _cached(self, query, bot_name, ticker, fetch):
+        """Return the value read by fetch(bot_name, ticker), from the cache while it is fresh. Callers get a copy they can modify."""
+        key = (query, bot_name, ticker)
+        position = self._cache_get(key)
+        if position is _MISS:
+            generation = self._cache_generation
+            position = self._cache_put(key, fetch(bot_name, ticker), generation)
+        return copy.copy(position)
+
+    def _cache_get(self, key):
+        """The cached value of key while it is fresh, _MISS otherwise."""
+        entry = self._position_cache.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._cache_hits += 1
+            return entry[1]
+        self._cache_misses += 1
+        return _MISS
+
+    def _cache_put(self, key, value, generation):
+        """Cache the value read for key for cache_ttl seconds, unless the cache changed since generation, and return it."""
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                if generation == self._cache_generation:
+                    self._position_cache[key] = (time.monotonic() + self.cache_ttl, value)
+        return value
+
+    def _invalidate(self, trade_position: TradeKitPosition):
+        """Drop the cached reads affected by a write of trade_position."""
+        self._evict(trade_position.bot_name, trade_position.ticker)
+
+    def _evict(self, bot_name, ticker):
+        """Drop the cached reads of the positions of a bot on a ticker."""
+        if self.cache_ttl > 0:
+            with self._cache_lock:
+                self._cache_generation += 1
+                for query in ("latest_open", "last"):
+                    self._position_cache.pop((query, bot_name, ticker), None)
+                self._position_cache.pop(("last_observed_exit", None, None), None)
+
+    def _drop_cache(self):
+        """Drop every cached read."""
+        with self._cache_lock:
+            self._cache_generation += 1
+            self._position_cache.clear()
+
+    def cache_info(self):
+        """Return the hit and miss counts and the size of the position cache."""
+        return {"hits": self._cache_hits, "misses": self._cache_misses, "size": len(self._position_cache)}
+
+    def cache_clear(self):
+        """Empty the position cache and reset its counters."""
+        self._drop_cache()
+        self._cache_hits = 0
+        self._cache_misses = 0
+
+    def write_buffer(self):
+        """
+        Return a new buffer for the position writes of a single user, e.g. a backtest bot. Writes made inside
+        buffering(buffer) are kept in it until flush(buffer) or until WRITE_BUFFER_SIZE are pending, other
+        users of the instance keep writing right away. close() flushes the buffers still holding writes.
         """
-        with self.conn.cursor() as cur:
-            cur.execute(create_table_query)
-            self.conn.commit()
+        buffer = _WriteBuffer()
+        self._buffers.add(buffer)
+        return buffer
 
-    def update_position(self, trade_position: TradeKitPosition):
-        """ Generates the UPDATE SQL statement dynamically for an existing position. """
+    @contextlib.contextmanager
+    def buffering(self, buffer):
+        """Keep the position writes the current thread or task makes inside the block in buffer, see write_buffer()."""
+        token = self._active_buffer.set(buffer)
+        try:
+            yield
+        finally:
+            self._active_buffer.reset(token)
+
+    def _current_buffer(self):
+        """The buffer position writes go to, None when they are written right away."""
+        buffer = self._active_buffer.get()
+        if buffer is None and self.buffer_writes:
+            buffer = self._buffer
+        return buffer
+
+    def _defer_update(self, trade_position: TradeKitPosition):
+        """Queue the update of trade_position in the buffer in use and return the buffer, None when the update is written right away."""
+        self._invalidate(trade_position)
+        buffer = self._current_buffer()
+        if buffer is None:
+            return None
+        if id(trade_position) in buffer.creates:
+            # not inserted yet, the INSERT at flush time writes its final state
+            return buffer
         if trade_position.id is None:
             raise ValueError("Position ID is required for updating the database.")
+        # later updates of the same position replace the earlier ones
+        buffer.updates[trade_position.id] = trade_position
+        return buffer
 
-        fields_to_update = {}
-        
-        # convert the passed object's attributes into a dictionary
-        position_data = vars(trade_position)
+    def _defer_create(self, trade_position: TradeKitPosition):
+        """Queue the insert of trade_position in the buffer in use and return the buffer, None when the insert is written right away."""
+        self._invalidate(trade_position)
+        buffer = self._current_buffer()
+        if buffer is not None:
+            buffer.creates[id(trade_position)] = trade_position
+        return buffer
 
-        # create an UPDATE statement with only the fields that have values, i.e. not None
-        for field, value in position_data.items():
-            if value is not None and field != "id":
-                fields_to_update[field] = value
-
-        if not fields_to_update:
-            raise ValueError("No fields to update.")
-        
-        set_clause = ", ".join([f"{key} = %s" for key in fields_to_update.keys()])
-        values = list(fields_to_update.values())
+    def update_position(self, trade_position: TradeKitPosition):
+        """ Update an existing position. When writes are buffered the update is deferred until flush(). """
+        buffer = self._defer_update(trade_position)
+        if buffer is not None:
+            self._flush_if_full(buffer)
+            return
 
-        sql_query = f"""
-        UPDATE trades
-        SET {set_clause}
-        WHERE id = %s
-        """
+        self.update_positions([trade_position])
 
-        values.append(trade_position.id)
+    def update_positions(self, trade_positions):
+        """Update several existing positions in a single round-trip. Fields that are None are left unchanged."""
+        params = self._update_params(trade_positions)
         try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql_query, values)
-            self.conn.commit()
-            self.logger.debug(f"Trade position {trade_position.id} updated successfully for {len(fields_to_update)} fields.")
+            with self._connection() as conn, conn.cursor() as cur:
+                cur.executemany(self.UPDATE_POSITION_QUERY, params)
+            self.logger.debug("%d trade positions updated successfully.", len(trade_positions))
         except Exception as e:
-            self.logger.debug(f"Error updating trade position {trade_position.id}: {e}")
+            self.logger.debug("Error updating trade positions: %s", e)
             raise
 
+    def _update_params(self, trade_positions):
+        """Parameters of UPDATE_POSITION_QUERY, one dict per position."""
+        params = []
+        for trade_position in trade_positions:
+            self._invalidate(trade_position)
+            if trade_position.id is None:
+                raise ValueError("Position ID is required for updating the database.")
+            params.append({field: getattr(trade_position, field) for field in self.POSITION_FIELDS})
+        return params
+
     def create_position(self, trade_position: TradeKitPosition):        
-        """Insert a new open trade position into the database."""
-        
-        insert_query = """
-        INSERT INTO trades (bot_name, ticker, stop_loss, take_profit, position_type, quantity, entry_submit_price, action, entry_submit_date, status)
-        VALUES (%(bot_name)s, %(ticker)s, %(stop_loss)s, %(take_profit)s, %(position_type)s, %(quantity)s, %(entry_submit_price)s, %(action)s, %(entry_submit_date)s, %(status)s)
-        RETURNING id;
-        """
+        """Insert a new open trade position into the database. When writes are buffered the insert is deferred until flush() and the id is None until then."""
+        buffer = self._defer_create(trade_position)
+        if buffer is not None:
+            self._flush_if_full(buffer)
+            return trade_position.id
+        return self.create_positions([trade_position])[0]
 
-        params = {
-            "bot_name": trade_position.bot_name,
-            "ticker": trade_position.ticker,
-            "stop_loss": trade_position.stop_loss,
-            "take_profit": trade_position.take_profit,
-            "position_type": trade_position.position_type,
-            "quantity": trade_position.quantity,
-            "entry_submit_price": trade_position.entry_submit_price,
-            "action": trade_position.action,
-            "entry_submit_date": trade_position.entry_submit_date if trade_position.entry_submit_date else None,  # NULL handling
-            "status": trade_position.status if trade_position.status else "PENDING",  # default status is PENDING
-        }
+    def _insert_params(self, trade_positions):
+        """Parameters of INSERT_POSITION_QUERY, one dict per position."""
+        for trade_position in trade_positions:
+            self._invalidate(trade_position)
+        columns = self.INSERT_COLUMNS
+        return [{column: getattr(p, column) for column in columns} for p in trade_positions]
+
+    def _copy_row(self, trade_position: TradeKitPosition, trade_id):
+        """Row of COPY_POSITIONS_QUERY for trade_position stored under trade_id."""
+        return [trade_id] + [getattr(trade_position, column) for column in self.INSERT_COLUMNS]
+
+    @staticmethod
+    def _assign_ids(trade_positions, ids):
+        for trade_position, trade_id in zip(trade_positions, ids):
+            trade_position.id = trade_id
+        return ids
+
+    def create_positions(self, trade_positions):
+        """Insert several positions with all of their fields in a single transaction and assign the new ids to them."""
+        if not trade_positions:
+            return []
+
+        params = self._insert_params(trade_positions)
+        try:
+            with self._connection() as conn, conn.cursor() as cur:
+                cur.executemany(self.INSERT_POSITION_QUERY, params, returning=True)
+                ids = []
+                while True:
+                    ids.append(cur.fetchone()["id"])
+                    if not cur.nextset():
+                        break
+        except Exception as e:
+            self.logger.debug("Error creating trade positions: %s", e)
+            raise
+
+        return self._assign_ids(trade_positions, ids)
 
+    def bulk_load_positions(self, trade_positions):
+        """
+        Insert many positions, e.g. backtest results or imported historical fills, with COPY instead of
+        INSERT statements. Ids are reserved from the trades sequence up front and assigned to the positions.
+        Writes are never buffered. Use create_positions() for a handful of positions.
+        """
+        trade_positions = list(trade_positions)
+        if not trade_positions:
+            return []
+
+        for trade_position in trade_positions:
+            self._invalidate(trade_position)
         try:
-            with self.conn.cursor() as cur:
-                cur.execute(insert_query, params)
-                trade_id = cur.fetchone()["id"]
-                self.conn.commit()
-                return trade_id
+            with self._connection() as conn, conn.cursor() as cur:
+                cur.execute(self.RESERVE_IDS_QUERY, (len(trade_positions),))
+                ids = [row["id"] for row in cur.fetchall()]
+                with cur.copy(self.COPY_POSITIONS_QUERY) as cp:
+                    for trade_position, trade_id in zip(trade_positions, ids):
+                        cp.write_row(self._copy_row(trade_position, trade_id))
+            self.logger.debug("%d trade positions loaded successfully.", len(ids))
         except Exception as e:
-            self.conn.rollback()
-            self.logger.debug(f"Error creating trade position: {e}")
+            self.logger.debug("Error loading trade positions: %s", e)
             raise
 
+        return self._assign_ids(trade_positions, ids)
+
+    def _is_full(self, buffer) -> bool:
+        """Whether WRITE_BUFFER_SIZE writes are pending in buffer, it is then flushed to bound the memory a long backtest holds."""
+        return len(buffer) >= self.WRITE_BUFFER_SIZE
+
+    def _flush_if_full(self, buffer):
+        if self._is_full(buffer):
+            self.flush(buffer)
+
+    def flush(self, buffer=None):
+        """Write the buffered position inserts and updates to the database, those of buffer or else of the buffer in use."""
+        if buffer is None:
+            buffer = self._current_buffer()
+        if not buffer:
+            return
+        if buffer.creates:
+            self.create_positions(list(buffer.creates.values()))
+            buffer.creates = {}
+        if buffer.updates:
+            self.update_positions(list(buffer.updates.values()))
+            buffer.updates = {}
+
     def get_latest_open_position(self, bot_name, ticker):
         """Fetch the latest open trade position for a bot on a specific ticker."""
-        query = """
-        SELECT id, bot_name, ticker, stop_loss, take_profit, observed_entry_date, observed_exit_date, position_type,  
-            quantity, action, entry_submit_date, entry_submit_price, entry_date, entry_price, 
-            exit_submit_date, exit_submit_price, exit_date, exit_price, exit_reason, trigger,
-            order_type, status
-        FROM trades
-        WHERE bot_name = %s AND ticker = %s AND status = 'OPEN'
-        ORDER BY entry_date DESC
-        LIMIT 1;
-        """
-        with self.conn.cursor() as cur:
-            cur.execute(query, (bot_name, ticker))
-            row = cur.fetchone()
-            
-            if row:
-                return TradeKitPosition(
-                    id=row["id"],
-                    bot_name=row["bot_name"],
-                    ticker=row["ticker"],
-                    stop_loss=row["stop_loss"],
-                    take_profit=row["take_profit"],
-                    observed_entry_date=row["observed_entry_date"],
-                    observed_exit_date=row["observed_exit_date"],
-                    position_type=row["position_type"],
-                    quantity=row["quantity"],
-                    action=row["action"],
-                    entry_submit_date=row["entry_submit_date"],
-                    entry_submit_price=row["entry_submit_price"],
-                    entry_date=row["entry_date"],
-                    entry_price=row["entry_price"],
-                    exit_submit_date=row["exit_submit_date"],
-                    exit_submit_price=row["exit_submit_price"],
-                    exit_date=row["exit_date"],
-                    exit_price=row["exit_price"],
-                    exit_reason=row["exit_reason"],
-                    trigger=row["trigger"],
-                    order_type=row["order_type"],
-                    status=row["status"]
-                )
-            else:
-                return None
+        return self._cached("latest_open", bot_name, ticker, self._fetch_latest_open_position)
 
+    def _fetch_latest_open_position(self, bot_name, ticker):
+        self.flush()
+        # the selected columns are named like the TradeKitPosition fields, rows are built directly from them
+        with self._connection() as conn, conn.cursor(row_factory=class_row(TradeKitPosition)) as cur:
+            cur.execute(self.LATEST_OPEN_POSITION_QUERY, (bot_name, ticker), prepare=True)
+            return cur.fetchone()
 
     def get_last_position(self, bot_name, ticker):
         """Fetch the latest trade position for a bot on a specific ticker"""
-        query = """
-        SELECT id, bot_name, ticker, stop_loss, take_profit, observed_entry_date, observed_exit_date, position_type, 
-            quantity, action, entry_submit_date, entry_submit_price, entry_date, entry_price, 
-            exit_submit_date, exit_submit_price, exit_date, exit_price, exit_reason,
-            order_type, status
-        FROM trades
-        WHERE bot_name = %s AND ticker = %s
-        ORDER BY id DESC
-        LIMIT 1;
-        """
-        with self.conn.cursor() as cur:
-            cur.execute(query, (bot_name, ticker))
-            row = cur.fetchone()
-            
-            if row:
-                return TradeKitPosition(
-                    id=row["id"],
-                    bot_name=row["bot_name"],
-                    ticker=row["ticker"],
-                    stop_loss=row["stop_loss"],
-                    take_profit=row["take_profit"],
-                    observed_entry_date=row["observed_entry_date"],
-                    observed_exit_date=row["observed_exit_date"],
-                    position_type=row["position_type"],
-                    quantity=row["quantity"],
-                    action=row["action"],
-                    entry_submit_date=row["entry_submit_date"],
-                    entry_submit_price=row["entry_submit_price"],
-                    entry_date=row["entry_date"],
-                    entry_price=row["entry_price"],
-                    exit_submit_date=row["exit_submit_date"],
-                    exit_submit_price=row["exit_submit_price"],
-                    exit_date=row["exit_date"],
-                    exit_price=row["exit_price"],
-                    exit_reason=row["exit_reason"],
-                    order_type=row["order_type"],
-                    status=row["status"]
-                )
-            else:
-                return None
+        return self._cached("last", bot_name, ticker, self._fetch_last_position)
+
+    def _fetch_last_position(self, bot_name, ticker):
+        self.flush()
+        with self._connection() as conn, conn.cursor(row_factory=class_row(TradeKitPosition)) as cur:
+            cur.execute(self.LAST_POSITION_QUERY, (bot_name, ticker), prepare=True)
+            return cur.fetchone()
 
     def get_last_observed_exit_date(self):
         """Fetch the observed_exit_date of the most recent CLOSED trade."""
-        query = """
-        SELECT observed_exit_date 
-        FROM trades 
-        WHERE status = 'CLOSED' 
-        ORDER BY observed_exit_date DESC 
-        LIMIT 1;
-        """
+        # any write may close a trade, the cached date is dropped on every write of any bot and ticker
+        return self._cached("last_observed_exit", None, None, self._fetch_last_observed_exit_date)
+
+    def _fetch_last_observed_exit_date(self, bot_name, ticker):
+        self.flush()
         try:
-            with self.conn.cursor() as cursor:
-                cursor.execute(query)
+            with self._connection() as conn, conn.cursor() as cursor:
+                cursor.execute(self.LAST_OBSERVED_EXIT_DATE_QUERY, prepare=True)
                 result = cursor.fetchone()
                 return result['observed_exit_date'] if result else None
         except Exception as e:
-            self.logger.debug(f"Error fetching last closed trade exit date: {e}")
+            self.logger.debug("Error fetching last closed trade exit date: %s", e)
             raise
 
 
     def close(self):
-        """Close database connection."""
-        if self.conn:
-            self.conn.close()
-            self.logger.debug(f"Database connection closed.")
\ No newline at end of file
+        """Write any buffered positions and close the connection pool."""
+        if self.pool:
+            for buffer in [self._buffer, *self._buffers]:
+                self.flush(buffer)
+            self._stop_listener()
+            self.pool.close()
+            self.pool = None
+            self.logger.debug("Database connection pool closed.")
+class InMemoryTradeKitDB(TradeKitDB):
+    def __init__(self):
+        """
+        Initialize an in-memory trades store for backtests. It has the interface of TradeKitDB but keeps
+        the positions in a dict keyed by id instead of a PostgreSQL table, so no SQL is executed.
+        Like with TradeKitDB, copies of the positions are stored and the getters return copies, changes
+        to a position are only seen once it is updated. Use persist() to copy the positions to a TradeKitDB
+        at the end of a backtest.
+        """
+        # reads are served from the dict directly, the cache stays empty, and writes are never buffered
+        self._setup_state(cache_ttl=0, listen=False)
+        self._positions = {}
+        self._next_id = 1
+
+    @classmethod
+    def get_default(cls):
+        """Not available, every backtest keeps its positions in an InMemoryTradeKitDB of its own."""
+        raise RuntimeError("InMemoryTradeKitDB has no shared instance, create one per backtest with InMemoryTradeKitDB()")
+
+    def connect(self):
+        """Nothing to connect to."""
+
+    def create_table(self):
+        """Nothing to create."""
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """Nothing to commit, the block runs as is."""
+        yield
+
+    def update_position(self, trade_position: TradeKitPosition):
+        """Update an existing position."""
+        if trade_position.id is None:
+            raise ValueError("Position ID is required for updating the database.")
+        if trade_position.id not in self._positions:
+            raise ValueError(f"No position with id {trade_position.id}.")
+        self._positions[trade_position.id] = copy.copy(trade_position)
+
+    def update_positions(self, trade_positions):
+        """Update several existing positions."""
+        for trade_position in trade_positions:
+            self.update_position(trade_position)
+
+    def create_position(self, trade_position: TradeKitPosition):
+        """Store a new position, assign the new id to it and return the id."""
+        trade_position.id = self._next_id
+        self._next_id += 1
+        self._positions[trade_position.id] = copy.copy(trade_position)
+        return trade_position.id
+
+    def create_positions(self, trade_positions):
+        """Store several positions and assign the new ids to them."""
+        return [self.create_position(trade_position) for trade_position in trade_positions]
+
+    def bulk_load_positions(self, trade_positions):
+        """Store many positions and assign the new ids to them."""
+        return self.create_positions(list(trade_positions))
+
+    def write_buffer(self):
+        """Nothing is buffered."""
+        return None
+
+    @contextlib.contextmanager
+    def buffering(self, buffer):
+        """Nothing is buffered, the block runs as is."""
+        yield
+
+    def flush(self, buffer=None):
+        """Nothing is buffered."""
+
+    def get_latest_open_position(self, bot_name, ticker):
+        """Fetch the latest open trade position for a bot on a specific ticker."""
+        positions = [p for p in self._positions.values() if p.bot_name == bot_name and p.ticker == ticker and p.status == "OPEN"]
+        if not positions:
+            return None
+        # like ORDER BY entry_date DESC, positions without an entry date come first
+        return copy.copy(max(positions, key=lambda p: (p.entry_date is None, p.entry_date or datetime.min)))
+
+    def get_last_position(self, bot_name, ticker):
+        """Fetch the latest trade position for a bot on a specific ticker"""
+        for trade_position in reversed(self._positions.values()):
+            if trade_position.bot_name == bot_name and trade_position.ticker == ticker:
+                return copy.copy(trade_position)
+        return None
+
+    def get_last_observed_exit_date(self):
+        """Fetch the observed_exit_date of the most recent CLOSED trade."""
+        positions = [p for p in self._positions.values() if p.status == "CLOSED"]
+        if not positions:
+            return None
+        # like ORDER BY observed_exit_date DESC, positions without an exit date come first
+        return max(positions, key=lambda p: (p.observed_exit_date is None, p.observed_exit_date or datetime.min)).observed_exit_date
+
+    def persist(self, db: TradeKitDB):
+        """Insert copies of all stored positions into db, the positions held here keep their ids."""
+        return db.bulk_load_positions([copy.copy(p) for p in self._positions.values()])
+
+    def close(self):
+        """Nothing to close."""
+
+class AsyncTradeKitDB(TradeKitDB):
+    def __init__(self, db_name, user, password, host="localhost", port=5432, min_size=2, max_size=10, cache_ttl=0, init_schema=True, listen=False):
+        """
+        Initialize a TradeKitDB for asyncio applications, the database methods are coroutines running on a
+        psycopg AsyncConnectionPool so a slow query doesn't block the event loop. The pool is opened by open().
+        The parameters are those of TradeKitDB.
+        """
+        self._setup(db_name, user, password, host, port, min_size, max_size, cache_ttl, init_schema, listen)
+
+    # instance shared by the process, separate from the one of TradeKitDB, see get_default()
+    _default = None
+    _default_lock = None
+
+    @classmethod
+    async def get_default(cls):
+        """
+        Return the AsyncTradeKitDB shared by the process, created from the PostgreSQL environment variables
+        like TradeKitDB.get_default() and opened on first use, e.g. db = await AsyncTradeKitDB.get_default().
+        """
+        if cls._default_lock is None:
+            cls._default_lock = asyncio.Lock()
+        async with cls._default_lock:
+            if cls._default is None or cls._default.pool is None:
+                default = cls(**cls._default_params())
+                await default.open()
+                cls._default = default
+            return cls._default
+
+    async def open(self):
+        """Open the connection pool and create the trades table, once per process, unless init_schema is False."""
+        await self.connect()
+        key = (self.host, self.port, self.db_name)
+        if self.init_schema and key not in self._schema_ready:
+            await self.create_table()
+            self._schema_ready.add(key)
+
+    async def connect(self):
+        """Open the connection pool. Broken connections are replaced by the pool."""
+        conninfo = self._conninfo()
+        pool = AsyncConnectionPool(**self._pool_args(conninfo), open=False)
+        try:
+            await pool.open(wait=True)
+        except Exception as e:
+            await pool.close()
+            self.logger.debug("Error connecting to database: %s", e)
+            raise
+        self.pool = pool
+        self.logger.debug("Database connection pool established.")
+        if self.listen and self.cache_ttl > 0:
+            await self._start_listener(conninfo)
+
+    async def _start_listener(self, conninfo):
+        """Open a connection listening on NOTIFY_CHANNEL and start the task reading its notifications."""
+        conn = await psycopg.AsyncConnection.connect(conninfo, autocommit=True)
+        await conn.execute(f"LISTEN {self.NOTIFY_CHANNEL}")
+        self._listener_conn = conn
+        self._listener = asyncio.create_task(self._listen(), name="tradekit-cache-listener")
+
+    async def _listen(self):
+        """Drop the cached reads of the bot and ticker of every notification until close() is called."""
+        try:
+            async for notify in self._listener_conn.notifies():
+                bot_name, _, ticker = notify.payload.partition("|")
+                self._evict(bot_name, ticker)
+        except psycopg.Error as e:
+            self.logger.debug("Position cache listener stopped: %s", e)
+
+    async def _stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            await self._listener_conn.close()
+            self._listener = None
+            self._listener_conn = None
+
+    async def create_table(self):
+        """Create a trades table if it doesn't exist."""
+        async with self._connection() as conn, conn.cursor() as cur:
+            await cur.execute(self.SCHEMA_SCRIPT, prepare=False)
+
+    @contextlib.asynccontextmanager
+    async def transaction(self):
+        """Run the statements issued by the task inside the block in a single transaction, see TradeKitDB.transaction()."""
+        if self._transaction_conn.get() is not None:
+            yield
+            return
+        async with self.pool.connection() as conn:
+            token = self._transaction_conn.set(conn)
+            try:
+                yield
+            except BaseException as e:
+                if isinstance(e, Exception) and not self._transaction_failed(conn, e):
+                    await conn.commit()
+                else:
+                    self._drop_cache()
+                raise
+            else:
+                if self._transaction_failed(conn):
+                    await conn.rollback()
+                    self._drop_cache()
+                    raise RuntimeError("Transaction rolled back, a statement executed inside the block failed.")
+            finally:
+                self._transaction_conn.reset(token)
+
+    async def _cached(self, query, bot_name, ticker, fetch):
+        """Return the value read by fetch(bot_name, ticker), from the cache while it is fresh. Callers get a copy they can modify."""
+        key = (query, bot_name, ticker)
+        position = self._cache_get(key)
+        if position is _MISS:
+            generation = self._cache_generation
+            position = self._cache_put(key, await fetch(bot_name, ticker), generation)
+        return copy.copy(position)
+
+    async def update_position(self, trade_position: TradeKitPosition):
+        """ Update an existing position. When writes are buffered the update is deferred until flush(). """
+        buffer = self._defer_update(trade_position)
+        if buffer is not None:
+            if self._is_full(buffer):
+                await self.flush(buffer)
+            return
+
+        await self.update_positions([trade_position])
+
+    async def update_positions(self, trade_positions):
+        """Update several existing positions in a single round-trip. Fields that are None are left unchanged."""
+        params = self._update_params(trade_positions)
+        try:
+            async with self._connection() as conn, conn.cursor() as cur:
+                await cur.executemany(self.UPDATE_POSITION_QUERY, params)
+            self.logger.debug("%d trade positions updated successfully.", len(trade_positions))
+        except Exception as e:
+            self.logger.debug("Error updating trade positions: %s", e)
+            raise
+
+    async def create_position(self, trade_position: TradeKitPosition):
+        """Insert a new open trade position into the database. When writes are buffered the insert is deferred until flush() and the id is None until then."""
+        buffer = self._defer_create(trade_position)
+        if buffer is not None:
+            if self._is_full(buffer):
+                await self.flush(buffer)
+            return trade_position.id
+        return (await self.create_positions([trade_position]))[0]
+
+    async def create_positions(self, trade_positions):
+        """Insert several positions with all of their fields in a single transaction and assign the new ids to them."""
+        if not trade_positions:
+            return []
+
+        params = self._insert_params(trade_positions)
+        try:
+            async with self._connection() as conn, conn.cursor() as cur:
+                await cur.executemany(self.INSERT_POSITION_QUERY, params, returning=True)
+                ids = []
+                while True:
+                    ids.append((await cur.fetchone())["id"])
+                    if not cur.nextset():
+                        break
+        except Exception as e:
+            self.logger.debug("Error creating trade positions: %s", e)
+            raise
+
+        return self._assign_ids(trade_positions, ids)
+
+    async def bulk_load_positions(self, trade_positions):
+        """Insert many positions with COPY instead of INSERT statements and assign the reserved ids to them."""
+        trade_positions = list(trade_positions)
+        if not trade_positions:
+            return []
+
+        for trade_position in trade_positions:
+            self._invalidate(trade_position)
+        try:
+            async with self._connection() as conn, conn.cursor() as cur:
+                await cur.execute(self.RESERVE_IDS_QUERY, (len(trade_positions),))
+                ids = [row["id"] for row in await cur.fetchall()]
+                async with cur.copy(self.COPY_POSITIONS_QUERY) as cp:
+                    for trade_position, trade_id in zip(trade_positions, ids):
+                        await cp.write_row(self._copy_row(trade_position, trade_id))
+            self.logger.debug("%d trade positions loaded successfully.", len(ids))
+        except Exception as e:
+            self.logger.debug("Error loading trade positions: %s", e)
+            raise
+
+        return self._assign_ids(trade_positions, ids)
+
+    async def flush(self, buffer=None):
+        """Write the buffered position inserts and updates to the database, those of buffer or else of the buffer in use."""
+        if buffer is None:
+            buffer = self._current_buffer()
+        if not buffer:
+            return
+        if buffer.creates:
+            await self.create_positions(list(buffer.creates.values()))
+            buffer.creates = {}
+        if buffer.updates:
+            await self.update_positions(list(buffer.updates.values()))
+            buffer.updates = {}
+
+    async def get_latest_open_position(self, bot_name, ticker):
+        """Fetch the latest open trade position for a bot on a specific ticker."""
+        return await self._cached("latest_open", bot_name, ticker, self._fetch_latest_open_position)
+
+    async def _fetch_latest_open_position(self, bot_name, ticker):
+        await self.flush()
+        async with self._connection() as conn, conn.cursor(row_factory=class_row(TradeKitPosition)) as cur:
+            await cur.execute(self.LATEST_OPEN_POSITION_QUERY, (bot_name, ticker), prepare=True)
+            return await cur.fetchone()
+
+    async def get_last_position(self, bot_name, ticker):
+        """Fetch the latest trade position for a bot on a specific ticker"""
+        return await self._cached("last", bot_name, ticker, self._fetch_last_position)
+
+    async def _fetch_last_position(self, bot_name, ticker):
+        await self.flush()
+        async with self._connection() as conn, conn.cursor(row_factory=class_row(TradeKitPosition)) as cur:
+            await cur.execute(self.LAST_POSITION_QUERY, (bot_name, ticker), prepare=True)
+            return await cur.fetchone()
+
+    async def get_last_observed_exit_date(self):
+        """Fetch the observed_exit_date of the most recent CLOSED trade."""
+        return await self._cached("last_observed_exit", None, None, self._fetch_last_observed_exit_date)
+
+    async def _fetch_last_observed_exit_date(self, bot_name, ticker):
+        await self.flush()
+        try:
+            async with self._connection() as conn, conn.cursor() as cursor:
+                await cursor.execute(self.LAST_OBSERVED_EXIT_DATE_QUERY, prepare=True)
+                result = await cursor.fetchone()
+                return result['observed_exit_date'] if result else None
+        except Exception as e:
+            self.logger.debug("Error fetching last closed trade exit date: %s", e)
+            raise
+
+    async def close(self):
+        """Write any buffered positions and close the connection pool."""
+        if self.pool:
+            for buffer in [self._buffer, *self._buffers]:
+                await self.flush(buffer)
+            await self._stop_listener()
+            await self.pool.close()
+            self.pool = None
+            self.logger.debug("Database connection pool closed.")
@@ -1,120 +1,195 @@
-from datetime import datetime
-from typing import Optional, Literal
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from enum import IntEnum
+from typing import ClassVar, NamedTuple, Optional, Literal, Union
+import numpy as np
 
+class Action(IntEnum):
+    """Compact encoding of an order action, used by the columnar and vectorized code paths."""
+    BUY = 0
+    SELL = 1
+
+    def __str__(self):
+        return self.name
+
+class PositionType(IntEnum):
+    """Compact encoding of a position type, used by the columnar and vectorized code paths."""
+    LONG = 0
+    SHORT = 1
+
+    def __str__(self):
+        return self.name
+
+class Status(IntEnum):
+    """Compact encoding of a position status, used by the columnar and vectorized code paths."""
+    PENDING = 0
+    OPEN = 1
+    PARTIAL = 2
+    CLOSED = 3
+    CANCELED = 4
+    FAILED = 5
+
+    def __str__(self):
+        return self.name
+
+class OHLCVView(NamedTuple):
+    """Column arrays of the loaded bar data, see TradeKitBot.ohlcv_arrays()."""
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+def _format_date(date: Optional[datetime]) -> Optional[str]:
+    """Format a date as 'YYYY-MM-DD HH:MM:SS', a timezone-aware date in UTC like the naive ones of PositionTable."""
+    if not date:
+        return None
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    # the dates of a position are formatted again on every to_dict() call, isoformat() is faster than the equivalent strftime()
+    return date.isoformat(sep=" ", timespec="seconds")
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _datetime_from_ns(ts) -> datetime:
+    """Convert nanoseconds since the epoch, e.g. a bar timestamp, to a naive datetime, in UTC for timezone-aware data."""
+    return _EPOCH + timedelta(microseconds=int(ts) // 1000)
+
+def _datetime_to_ns(date: datetime) -> int:
+    """Convert a datetime to nanoseconds since the epoch, a timezone-aware one in UTC. The inverse of _datetime_from_ns()."""
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    # a pandas Timestamp carries nanoseconds below the microseconds of datetime
+    return (date - _EPOCH) // timedelta(microseconds=1) * 1000 + getattr(date, "nanosecond", 0)
+
+@dataclass(slots=True, eq=False)
 class TradeKitPosition:
-    VALID_POSITION_TYPES = ["LONG", "SHORT"]
-    VALID_ACTIONS = ["BUY", "SELL"]
-    VALID_STATUSES = ["PENDING", "OPEN", "PARTIAL", "CLOSED", "CANCELED", "FAILED"]
-    VALID_ORDER_TYPES = ["LIMIT", "MARKET"]
-    VALID_EXIT_REASONS = ['TECHNICAL', 'STOP_LOSS', 'TAKE_PROFIT', 'MANUAL', 'TIMEOUT', 'SIGNAL', 'OTHER']
-
-    def __init__(
-        self, 
-        bot_name: str, 
-        ticker: str, 
-        position_type: Literal["LONG", "SHORT"],
-        quantity: int, 
-        action: Literal["BUY", "SELL"],
-        entry_submit_price: float, 
-        order_type: Literal["LIMIT", "MARKET"] = "MARKET",
-        status: Literal["PENDING", "OPEN", "PARTIAL", "CLOSED", "CANCELED", "FAILED"] = "PENDING",
-        entry_submit_date: Optional[datetime] = None, 
-        entry_date: Optional[datetime] = None, 
-        entry_price: Optional[float] = None, 
-        exit_submit_date: Optional[datetime] = None, 
-        exit_submit_price: Optional[float] = None, 
-        exit_date: Optional[datetime] = None, 
-        exit_price: Optional[float] = None,
-        exit_reason: Optional[str] = None,
-        trigger: Optional[str] = None,
-        stop_loss: Optional[float] = None,
-        take_profit: Optional[float] = None,
-        id: Optional[int] = None, 
-        observed_entry_date: Optional[datetime] = None,
-        observed_exit_date: Optional[datetime] = None
-    ):
-        """Initialize a TradeKitPosition object.
-        Args:
-            bot_name (str): Name of the trading bot.
-            ticker (str): Ticker symbol of the asset.
-            position_type (str): Type of position ("LONG" or "SHORT").
-            quantity (int): Quantity of the asset.
-            action (str): Action to be taken ("BUY" or "SELL").
-            entry_submit_price (float): Price at which the order is submitted.
-            order_type (str): Type of order ("LIMIT" or "MARKET").
-            status (str): Status of the trade.
-            entry_submit_date (datetime, optional): Date when the order was submitted.
-            entry_date (datetime, optional): Date when the trade was executed.
-            entry_price (float, optional): Price at which the trade was executed.
-            exit_submit_date (datetime, optional): Date when the exit order was submitted.
-            exit_submit_price (float, optional): Price at which the exit order was submitted.
-            exit_date (datetime, optional): Date when the trade was closed.
-            exit_price (float, optional): Price at which the trade was closed.
-            exit_reason (str, optional): Reason for exiting the trade.
-            trigger (str, optional): Trigger condition for the trade.
-            stop_loss (float, optional): Stop loss price for risk management.
-            take_profit (float, optional): Take profit price for risk management.
-            id (int, optional): Unique identifier for the trade. Defaults to None.
-        """
-        self.id = id  # Primary Key, can be None for new trades before DB assignment
-        if not (1 <= len(bot_name) <= 50):  
+    """A trade position.
+    Args:
+        bot_name (str): Name of the trading bot.
+        ticker (str): Ticker symbol of the asset.
+        position_type (str): Type of position ("LONG" or "SHORT").
+        quantity (int): Quantity of the asset.
+        action (str): Action to be taken ("BUY" or "SELL").
+        entry_submit_price (float): Price at which the order is submitted.
+        order_type (str): Type of order ("LIMIT" or "MARKET").
+        status (str): Status of the trade.
+        entry_submit_date (datetime, optional): Date when the order was submitted.
+        entry_date (datetime, optional): Date when the trade was executed.
+        entry_price (float, optional): Price at which the trade was executed.
+        exit_submit_date (datetime, optional): Date when the exit order was submitted.
+        exit_submit_price (float, optional): Price at which the exit order was submitted.
+        exit_date (datetime, optional): Date when the trade was closed.
+        exit_price (float, optional): Price at which the trade was closed.
+        exit_reason (str, optional): Reason for exiting the trade.
+        trigger (str, optional): Trigger condition for the trade.
+        stop_loss (float, optional): Stop loss price for risk management.
+        take_profit (float, optional): Take profit price for risk management.
+        id (int, optional): Unique identifier for the trade. Defaults to None.
+    """
+    VALID_POSITION_TYPES: ClassVar[list] = ["LONG", "SHORT"]
+    VALID_ACTIONS: ClassVar[list] = ["BUY", "SELL"]
+    VALID_STATUSES: ClassVar[list] = ["PENDING", "OPEN", "PARTIAL", "CLOSED", "CANCELED", "FAILED"]
+    VALID_ORDER_TYPES: ClassVar[list] = ["LIMIT", "MARKET"]
+    VALID_EXIT_REASONS: ClassVar[list] = ['TECHNICAL', 'STOP_LOSS', 'TAKE_PROFIT', 'MANUAL', 'TIMEOUT', 'SIGNAL', 'OTHER']
+    # hashed lookups for the validation, the lists keep the order shown in errors and used by PositionTable.
+    # Valid values map to a canonical string, so every position shares the same few string objects
+    # whether the value came from a literal, the database or a JSON payload
+    _POSITION_TYPES: ClassVar[dict] = {value: value for value in VALID_POSITION_TYPES}
+    _ACTIONS: ClassVar[dict] = {value: value for value in VALID_ACTIONS}
+    _STATUSES: ClassVar[dict] = {value: value for value in VALID_STATUSES}
+    _ORDER_TYPES: ClassVar[dict] = {value: value for value in VALID_ORDER_TYPES}
+    _EXIT_REASONS: ClassVar[dict] = {value: value for value in VALID_EXIT_REASONS}
+
+    bot_name: str
+    ticker: str
+    position_type: Union[Literal["LONG", "SHORT"], PositionType]
+    quantity: int
+    action: Union[Literal["BUY", "SELL"], Action]
+    entry_submit_price: float
+    order_type: Literal["LIMIT", "MARKET"] = "MARKET"
+    status: Union[Literal["PENDING", "OPEN", "PARTIAL", "CLOSED", "CANCELED", "FAILED"], Status] = "PENDING"
+    entry_submit_date: Optional[datetime] = None
+    entry_date: Optional[datetime] = None
+    entry_price: Optional[float] = None
+    exit_submit_date: Optional[datetime] = None
+    exit_submit_price: Optional[float] = None
+    exit_date: Optional[datetime] = None
+    exit_price: Optional[float] = None
+    exit_reason: Optional[str] = None
+    trigger: Optional[str] = None
+    stop_loss: Optional[float] = None
+    take_profit: Optional[float] = None
+    id: Optional[int] = None  # Primary Key, can be None for new trades before DB assignment
+    observed_entry_date: Optional[datetime] = None
+    observed_exit_date: Optional[datetime] = None
+
+    def __post_init__(self):
+        """Validate the fields and fill in the defaults that depend on the current time."""
+        if not (1 <= len(self.bot_name) <= 50):  
             raise ValueError("Bot name must be between 1 and 50 characters")
-        self.bot_name = bot_name
-        if not (1 <= len(ticker) <= 30):  
+        if not (1 <= len(self.ticker) <= 30):  
             raise ValueError("Ticker must be between 1 and 30 characters")
-        if not ticker.isalnum():
+        if not self.ticker.isalnum():
             raise ValueError("Ticker must be alphanumeric")
-        self.ticker = ticker
-        if position_type not in self.VALID_POSITION_TYPES:
-            raise ValueError(f"Invalid position_type: {position_type}. Must be one of {self.VALID_POSITION_TYPES}")
+        # enum members are accepted and stored by name, the trades table keeps the strings
+        if isinstance(self.position_type, PositionType):
+            self.position_type = self.position_type.name
+        position_type = self._POSITION_TYPES.get(self.position_type)
+        if position_type is None:
+            raise ValueError(f"Invalid position_type: {self.position_type}. Must be one of {self.VALID_POSITION_TYPES}")
         self.position_type = position_type
-        if quantity <= 0:
-            raise ValueError(f"Invalid quantity: {quantity}. Must be greater than 0")
-        self.quantity = quantity
-        if action not in self.VALID_ACTIONS:
-            raise ValueError(f"Invalid action: {action}. Must be one of {self.VALID_ACTIONS}")
+        if self.quantity <= 0:
+            raise ValueError(f"Invalid quantity: {self.quantity}. Must be greater than 0")
+        if isinstance(self.action, Action):
+            self.action = self.action.name
+        action = self._ACTIONS.get(self.action)
+        if action is None:
+            raise ValueError(f"Invalid action: {self.action}. Must be one of {self.VALID_ACTIONS}")
         self.action = action
-        self.observed_entry_date = observed_entry_date or datetime.now()
-        self.observed_exit_date = observed_exit_date or None
-
-        # risk management
-        self.stop_loss = stop_loss  # Optional stop loss price
-        self.take_profit = take_profit  # Optional take profit price
+        # both default to the time the position is created, read the clock once
+        if not self.observed_entry_date or not self.entry_submit_date:
+            now = datetime.now()
+            self.observed_entry_date = self.observed_entry_date or now
+            self.entry_submit_date = self.entry_submit_date or now
 
         # order details
-        if entry_submit_price and entry_submit_price <= 0:
-            raise ValueError(f"Invalid entry_submit_price: {entry_submit_price}. Must be greater than 0")
-        self.entry_submit_price = entry_submit_price
-        self.entry_submit_date = entry_submit_date or datetime.now()
+        if self.entry_submit_price and self.entry_submit_price <= 0:
+            raise ValueError(f"Invalid entry_submit_price: {self.entry_submit_price}. Must be greater than 0")
         
         # trade execution details
-        self.entry_date = entry_date
-        if entry_price and entry_price <= 0:
-            raise ValueError(f"Invalid entry_price: {entry_price}. Must be greater than 0")
-        self.entry_price = entry_price
+        if self.entry_price and self.entry_price <= 0:
+            raise ValueError(f"Invalid entry_price: {self.entry_price}. Must be greater than 0")
         
         # close details
-        self.exit_submit_date = exit_submit_date
-        if exit_submit_price and exit_submit_price <= 0:
-            raise ValueError(f"Invalid exit_submit_price: {exit_submit_price}. Must be greater than 0")
-        self.exit_submit_price = exit_submit_price
-        self.exit_date = exit_date
-        if exit_price and exit_price <= 0:
-            raise ValueError(f"Invalid exit_price: {exit_price}. Must be greater than 0")
-        self.exit_price = exit_price
-        if exit_reason and exit_reason not in self.VALID_EXIT_REASONS:  
-            raise ValueError(f"Invalied exit_reason: {exit_reason}. Must be one of {self.VALID_EXIT_REASONS}")
-        self.exit_reason = exit_reason or None
-        if trigger and not (1 <= len(trigger) <= 50):
-            raise ValueError("Trigger must be between 1 and 50 characters")
-        self.trigger = trigger or None
+        if self.exit_submit_price and self.exit_submit_price <= 0:
+            raise ValueError(f"Invalid exit_submit_price: {self.exit_submit_price}. Must be greater than 0")
+        if self.exit_price and self.exit_price <= 0:
+            raise ValueError(f"Invalid exit_price: {self.exit_price}. Must be greater than 0")
+        if self.exit_reason:
+            exit_reason = self._EXIT_REASONS.get(self.exit_reason)
+            if exit_reason is None:
+                raise ValueError(f"Invalied exit_reason: {self.exit_reason}. Must be one of {self.VALID_EXIT_REASONS}")
+            self.exit_reason = exit_reason
+        elif self.exit_reason is not None:
+            # an empty string is stored as NULL
+            self.exit_reason = None
+        if self.trigger:
+            if not (1 <= len(self.trigger) <= 50):
+                raise ValueError("Trigger must be between 1 and 50 characters")
+        elif self.trigger is not None:
+            self.trigger = None
 
         # order type & status
-        if order_type not in self.VALID_ORDER_TYPES:
-            raise ValueError(f"Invalid order_type: {order_type}. Must be one of {self.VALID_ORDER_TYPES}")  
+        order_type = self._ORDER_TYPES.get(self.order_type)
+        if order_type is None:
+            raise ValueError(f"Invalid order_type: {self.order_type}. Must be one of {self.VALID_ORDER_TYPES}")
         self.order_type = order_type
-        if status not in self.VALID_STATUSES:
-            raise ValueError(f"Invalid status: {status}. Must be one of {self.VALID_STATUSES}") 
+        if isinstance(self.status, Status):
+            self.status = self.status.name
+        status = self._STATUSES.get(self.status)
+        if status is None:
+            raise ValueError(f"Invalid status: {self.status}. Must be one of {self.VALID_STATUSES}")
         self.status = status
 
     def to_dict(self):
@@ -123,20 +198,20 @@ class TradeKitPosition:
             "id": self.id,
             "bot_name": self.bot_name,
             "ticker": self.ticker,
-            "observed_entry_date": self.observed_entry_date.strftime('%Y-%m-%d %H:%M:%S') if self.observed_entry_date else None,
-            "observed_exit_date": self.observed_exit_date.strftime('%Y-%m-%d %H:%M:%S') if self.observed_exit_date else None,
+            "observed_entry_date": _format_date(self.observed_entry_date),
+            "observed_exit_date": _format_date(self.observed_exit_date),
             "position_type": self.position_type,
             "quantity": self.quantity,
             "action": self.action,
             "stop_loss": self.stop_loss,
             "take_profit": self.take_profit,
-            "entry_submit_date": self.entry_submit_date.strftime('%Y-%m-%d %H:%M:%S') if self.entry_submit_date else None,
+            "entry_submit_date": _format_date(self.entry_submit_date),
             "entry_submit_price": self.entry_submit_price,
-            "entry_date": self.entry_date.strftime('%Y-%m-%d %H:%M:%S') if self.entry_date else None,
+            "entry_date": _format_date(self.entry_date),
             "entry_price": self.entry_price,
-            "exit_submit_date": self.exit_submit_date.strftime('%Y-%m-%d %H:%M:%S') if self.exit_submit_date else None,
+            "exit_submit_date": _format_date(self.exit_submit_date),
             "exit_submit_price": self.exit_submit_price,
-            "exit_date": self.exit_date.strftime('%Y-%m-%d %H:%M:%S') if self.exit_date else None,
+            "exit_date": _format_date(self.exit_date),
             "exit_price": self.exit_price,
             "exit_reason": self.exit_reason,
             "order_type": self.order_type,
@@ -144,10 +219,104 @@ class TradeKitPosition:
         }
 
     def __repr__(self):
-        return f"TradeKitPosition(id: {self.id}, \
-                                    name: {self.bot_name}, \
-                                    ticker: {self.ticker}, \
-                                    type: {self.position_type}, \
-                                    action:{self.action},\
-                                    Status: {self.status} \
-        )"
+        return f"TradeKitPosition({self.id}, {self.bot_name}, {self.ticker}, {self.position_type}, {self.action}, {self.status})"
+
+    def detail(self) -> str:
+        """Verbose description of the position listing every field, for callers that need more than repr()."""
+        fields = ", ".join(f"{name}: {value}" for name, value in self.to_dict().items())
+        return f"TradeKitPosition({fields})"
+
+class PositionTable:
+    """
+    Columnar log of the positions opened by a vectorized backtest. Every field is a NumPy array
+    indexed by row and the positions of a run are appended in one batch with extend(), without
+    allocating a TradeKitPosition per trade. Rows are turned into TradeKitPosition
+    objects on demand with position() and positions().
+    Position types, actions and statuses are stored as PositionType, Action and Status codes
+    and timestamps as nanoseconds since the epoch, so a column can be compared against a code
+    directly, e.g. table.status[:len(table)] == Status.OPEN.
+    The id column holds the database id once the rows are written, 0 before that.
+    """
+    COLUMNS = {
+        "id": np.int64,
+        "position_type": np.uint8,
+        "action": np.uint8,
+        "status": np.uint8,
+        "quantity": np.int64,
+        "entry_price": np.float64,
+        "exit_price": np.float64,
+        "entry_ts": np.int64,
+        "exit_ts": np.int64,
+    }
+
+    EPOCH = _EPOCH
+
+    def __init__(self, bot_name: str, ticker: str, capacity: int = 64):
+        self.bot_name = bot_name
+        self.ticker = ticker
+        self.n = 0
+        for name, dtype in self.COLUMNS.items():
+            setattr(self, name, np.zeros(capacity, dtype=dtype))
+
+    def __len__(self):
+        return self.n
+
+    def _grow(self):
+        """Double the capacity of every column."""
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(max(2 * column.shape[0], 1), dtype=column.dtype)
+            grown[:self.n] = column[:self.n]
+            setattr(self, name, grown)
+
+    def extend(self, position_type: Literal["LONG", "SHORT"], quantity, entry_price, entry_ts, exit_price, exit_ts, closed):
+        """
+        Append a batch of positions given as arrays, one element per position. The positions
+        flagged in closed are CLOSED, the others are left OPEN and their exit fields ignored.
+        """
+        count = len(quantity)
+        while self.n + count > self.quantity.shape[0]:
+            self._grow()
+        rows = slice(self.n, self.n + count)
+        opening = Action.BUY if position_type == "LONG" else Action.SELL
+        closing = Action.SELL if position_type == "LONG" else Action.BUY
+        self.position_type[rows] = PositionType[position_type]
+        self.action[rows] = np.where(closed, closing, opening)
+        self.status[rows] = np.where(closed, Status.CLOSED, Status.OPEN)
+        self.quantity[rows] = quantity
+        self.entry_price[rows] = entry_price
+        self.entry_ts[rows] = entry_ts
+        self.exit_price[rows] = np.where(closed, exit_price, 0.0)
+        self.exit_ts[rows] = np.where(closed, exit_ts, 0)
+        self.n += count
+
+    def position(self, row: int) -> "TradeKitPosition":
+        """Materialise a row as a TradeKitPosition."""
+        entry_date = _datetime_from_ns(self.entry_ts[row])
+        status = Status(self.status[row])
+        position = TradeKitPosition(
+            bot_name=self.bot_name,
+            ticker=self.ticker,
+            position_type=PositionType(self.position_type[row]),
+            quantity=int(self.quantity[row]),
+            action=Action(self.action[row]),
+            entry_submit_price=float(self.entry_price[row]),
+            status=status,
+            observed_entry_date=entry_date,
+            entry_submit_date=entry_date,
+            entry_date=entry_date,
+            entry_price=float(self.entry_price[row]),
+            id=int(self.id[row]) or None
+        )
+        if status == Status.CLOSED:
+            exit_date = _datetime_from_ns(self.exit_ts[row])
+            position.observed_exit_date = exit_date
+            position.exit_submit_date = exit_date
+            position.exit_date = exit_date
+            position.exit_submit_price = float(self.exit_price[row])
+            position.exit_price = float(self.exit_price[row])
+        return position
+
+    def positions(self) -> list:
+        """Materialise every row as a TradeKitPosition."""
+        return [self.position(row) for row in range(self.n)]
@@ -0,0 +1,40 @@
+import importlib.util
+import pathlib
+import sys
+import uuid
+import psycopg
+import pytest
+
+try:
+    import tradekit
+except ImportError:
+    # running from a checkout, the repository root is the package
+    root = pathlib.Path(__file__).resolve().parent.parent
+    spec = importlib.util.spec_from_file_location("tradekit", root / "__init__.py", submodule_search_locations=[str(root)])
+    tradekit = importlib.util.module_from_spec(spec)
+    sys.modules["tradekit"] = tradekit
+    spec.loader.exec_module(tradekit)
+
+@pytest.fixture(scope="session")
+def pg_params():
+    """Connection parameters of the PostgreSQL server given by PGDATABASE, PGUSER, PGPASSWORD, PGHOST and PGPORT. Tests using it are skipped without a server."""
+    params = tradekit.TradeKitDB._default_params()
+    try:
+        psycopg.connect(
+            dbname=params["db_name"], user=params["user"], password=params["password"],
+            host=params["host"], port=params["port"], connect_timeout=3
+        ).close()
+    except psycopg.Error as e:
+        pytest.skip(f"PostgreSQL is not available: {e}")
+    return params
+
+@pytest.fixture
+def db(pg_params):
+    db = tradekit.TradeKitDB(**pg_params, cache_ttl=0)
+    yield db
+    db.close()
+
+@pytest.fixture
+def bot_name():
+    """A bot name unique to the test, the tests only read and write the positions of their own bot."""
+    return f"test-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,79 @@
+import asyncio
+import psycopg
+import pytest
+from tradekit import AsyncTradeKitDB, TradeKitPosition
+
+def _position(bot_name, **fields):
+    fields = {"position_type": "LONG", "quantity": 10, "action": "BUY", "entry_submit_price": 100.0, **fields}
+    return TradeKitPosition(bot_name=bot_name, ticker="AAPL", **fields)
+
+def _run(pg_params, test):
+    """Run the coroutine test(db) on an opened AsyncTradeKitDB."""
+    async def main():
+        db = AsyncTradeKitDB(**pg_params)
+        await db.open()
+        try:
+            await test(db)
+        finally:
+            await db.close()
+    asyncio.run(main())
+
+def test_async_transaction_commits_once_on_exit(pg_params, bot_name):
+    async def test(db):
+        async with db.transaction():
+            await db.create_position(_position(bot_name))
+            async with db._connection() as conn:
+                assert conn is db._transaction_conn.get()
+        assert (await db.get_last_position(bot_name, "AAPL")).id is not None
+    _run(pg_params, test)
+
+def test_async_transaction_rolls_back_a_failed_statement(pg_params, bot_name):
+    async def test(db):
+        with pytest.raises(psycopg.Error):
+            async with db.transaction():
+                await db.create_position(_position(bot_name))
+                await db.create_position(_position(bot_name, entry_submit_price=1e9))
+        assert await db.get_last_position(bot_name, "AAPL") is None
+        with pytest.raises(RuntimeError, match="rolled back"):
+            async with db.transaction():
+                await db.create_position(_position(bot_name))
+                try:
+                    await db.create_position(_position(bot_name, entry_submit_price=1e9))
+                except psycopg.Error:
+                    pass
+        assert await db.get_last_position(bot_name, "AAPL") is None
+    _run(pg_params, test)
+
+def test_async_buffered_writes_are_flushed_creates_first(pg_params, bot_name):
+    async def test(db):
+        stored = _position(bot_name, status="OPEN")
+        await db.create_position(stored)
+        buffer = db.write_buffer()
+        with db.buffering(buffer):
+            created = _position(bot_name, status="OPEN")
+            assert await db.create_position(created) is None
+            created.quantity = 20
+            await db.update_position(created)
+            stored.status = "CLOSED"
+            await db.update_position(stored)
+            assert len(buffer) == 2
+        await db.flush(buffer)
+        assert created.id > stored.id
+        last = await db.get_last_position(bot_name, "AAPL")
+        assert (last.id, last.quantity) == (created.id, 20)
+        assert (await db.get_latest_open_position(bot_name, "AAPL")).id == created.id
+    _run(pg_params, test)
+
+def test_async_default_is_shared_and_opened(pg_params, monkeypatch):
+    for name, variable in (("db_name", "PGDATABASE"), ("user", "PGUSER"), ("password", "PGPASSWORD"), ("host", "PGHOST"), ("port", "PGPORT")):
+        monkeypatch.setenv(variable, str(pg_params[name]))
+
+    async def main():
+        db = await AsyncTradeKitDB.get_default()
+        try:
+            assert isinstance(db, AsyncTradeKitDB)
+            assert db.pool is not None
+            assert await AsyncTradeKitDB.get_default() is db
+        finally:
+            await db.close()
+    asyncio.run(main())
@@ -0,0 +1,80 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+from tradekit import TradeKitBot, TradeKitBroker, PositionTable
+
+def _data(n=500):
+    close = 100 + np.sin(np.arange(n) / 5) * 10
+    index = pd.date_range("2024-01-01", periods=n, freq="h")
+    return pd.DataFrame({"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000.0}, index=index)
+
+def _signals(o, h, l, c, v, ts):
+    """Buy on a rising close, sell on a falling one."""
+    actions = np.zeros(c.shape[0], dtype=np.int8)
+    actions[1:] = np.where(c[1:] > c[:-1], 1, -1)
+    return actions
+
+def _bot(deposit_assets):
+    broker = TradeKitBroker(None)
+    broker.deposit(10000)
+    broker.deposit_assets(deposit_assets)
+    broker.commission = 0.01
+    bot = TradeKitBot("test", "AAPL", None, broker, mode="backtest")
+    bot.load_data(_data())
+    return bot, broker
+
+def _summary(positions):
+    return [
+        (p.position_type, p.action, p.status, p.quantity, p.entry_price, p.exit_price, p.entry_date, p.exit_date)
+        for p in positions
+    ]
+
+@pytest.mark.parametrize("position_type, deposit_assets", [("LONG", 0), ("SHORT", 100)])
+def test_run_vectorized_matches_run(position_type, deposit_assets):
+    entry = 1 if position_type == "LONG" else -1
+
+    def strategy(bot):
+        o, h, l, c, v = bot.ohlcv_arrays()
+        actions = _signals(o, h, l, c, v, bot.ts)
+        open_position = False
+        for i, date in enumerate(bot.data.index):
+            if actions[i] == entry and not open_position:
+                place, open_position = (bot.buy if entry == 1 else bot.sell), True
+            elif actions[i] == -entry and open_position:
+                place, open_position = (bot.sell if entry == 1 else bot.buy), False
+            else:
+                continue
+            place(position_type, float(c[i]), observed_date=date.to_pydatetime())
+
+    bot, broker = _bot(deposit_assets)
+    bot.run(strategy)
+    per_bar = _summary(bot.db._positions.values())
+
+    vectorized_bot, vectorized_broker = _bot(deposit_assets)
+    vectorized_bot.run_vectorized(_signals, position_type=position_type)
+
+    assert len(per_bar) > 1
+    assert _summary(vectorized_bot.positions.positions()) == per_bar
+    assert _summary(vectorized_bot.db._positions.values()) == per_bar
+    assert vectorized_broker.cash == pytest.approx(broker.cash, rel=1e-12)
+    assert vectorized_broker.asset_holdings == broker.asset_holdings
+
+def test_position_table_round_trip():
+    table = PositionTable("test", "AAPL", capacity=1)
+    ts = pd.date_range("2024-01-01", periods=4, freq="D").as_unit("ns").asi8
+    table.extend("LONG", np.array([10, 20]), np.array([1.5, 2.5]), ts[:2], np.array([3.5, 0.0]), np.array([ts[2], 0]), np.array([True, False]))
+    table.extend("SHORT", np.array([30]), np.array([4.5]), ts[3:], np.array([0.0]), np.array([0]), np.array([False]))
+
+    assert len(table) == 3
+    closed, open_long, open_short = table.positions()
+    assert (closed.position_type, closed.action, closed.status, closed.quantity) == ("LONG", "SELL", "CLOSED", 10)
+    assert (closed.entry_price, closed.exit_price) == (1.5, 3.5)
+    assert (closed.entry_date, closed.exit_date) == (datetime(2024, 1, 1), datetime(2024, 1, 3))
+    assert (open_long.action, open_long.status, open_long.entry_date) == ("BUY", "OPEN", datetime(2024, 1, 2))
+    assert open_long.exit_price is None and open_long.exit_date is None
+    assert (open_short.position_type, open_short.action, open_short.quantity) == ("SHORT", "SELL", 30)
+    assert closed.id is None
+
+    table.id[:3] = [7, 8, 9]
+    assert [p.id for p in table.positions()] == [7, 8, 9]
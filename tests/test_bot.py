@@ -0,0 +1,54 @@
+import pathlib
+import subprocess
+import sys
+import textwrap
+import pytest
+from tradekit import TradeKitBot, TradeKitBroker
+
+def test_live_run_keeps_filled_orders_when_a_later_write_fails(db, bot_name):
+    broker = TradeKitBroker(db)
+    broker.deposit(10000)
+    bot = TradeKitBot(bot_name, "AAPL", db, broker)
+
+    def strategy(bot):
+        bot.buy("LONG", 100.0)
+        # the exit price overflows its NUMERIC(10,2) column, the write of the closing fill fails
+        bot.sell("LONG", 1e9)
+
+    with pytest.raises(RuntimeError):
+        bot.run(strategy)
+    stored = db.get_last_position(bot_name, "AAPL")
+    assert stored is not None
+    assert (stored.status, stored.quantity, stored.entry_price) == ("OPEN", 60, 100.0)
+
+def test_polars_backtest_does_not_import_pandas():
+    pytest.importorskip("polars")
+    script = textwrap.dedent("""
+        import importlib.util, sys
+        spec = importlib.util.spec_from_file_location("tradekit", sys.argv[1], submodule_search_locations=[sys.argv[2]])
+        tradekit = importlib.util.module_from_spec(spec)
+        sys.modules["tradekit"] = tradekit
+        spec.loader.exec_module(tradekit)
+        from datetime import datetime
+        import numpy as np
+        import polars as pl
+
+        close = 100 + np.sin(np.arange(100) / 5) * 10
+        data = pl.DataFrame({
+            "time": pl.datetime_range(datetime(2024, 1, 1), datetime(2024, 1, 5, 3), "1h", eager=True),
+            "open": close, "high": close + 1, "low": close - 1, "close": close, "volume": np.full(100, 1000.0),
+        })
+        broker = tradekit.TradeKitBroker(None)
+        broker.deposit(10000)
+        bot = tradekit.TradeKitBot("test", "AAPL", None, broker, mode="backtest")
+        bot.load_data(data)
+        bot.buy("LONG", float(close[0]), observed_date="2024-01-01T00:00:00")
+        bot.window(np.datetime64("2024-01-02T00:00"), 5)
+        bot.window(datetime(2024, 1, 2), 5)
+        # the position left open is closed through the regular order path at the first exit
+        bot.run_vectorized(lambda o, h, l, c, v, ts: np.where(np.arange(c.shape[0]) % 7 == 3, -1, 1).astype(np.int8))
+        assert bot.db._positions[1].observed_exit_date == datetime(2024, 1, 1, 3)
+        assert "pandas" not in sys.modules, "pandas was imported"
+    """)
+    root = pathlib.Path(__file__).resolve().parent.parent
+    subprocess.run([sys.executable, "-c", script, str(root / "__init__.py"), str(root)], check=True)
@@ -0,0 +1,185 @@
+from datetime import datetime, timezone
+import numpy as np
+import psycopg
+import pytest
+from tradekit import InMemoryTradeKitDB, TradeKitDB, TradeKitPosition
+
+def _position(bot_name, **fields):
+    fields = {"position_type": "LONG", "quantity": 10, "action": "BUY", "entry_submit_price": 100.0, **fields}
+    return TradeKitPosition(bot_name=bot_name, ticker="AAPL", **fields)
+
+def _stored_rows(db, *positions):
+    """The stored rows of positions without their ids, in the text form of the server."""
+    with db._connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT (to_jsonb(t) - 'id')::text AS row FROM trades t WHERE id = ANY(%s) ORDER BY id", ([p.id for p in positions],))
+        return [row["row"] for row in cur.fetchall()]
+
+def test_update_stores_values_like_insert(db, bot_name):
+    # numpy scalars, NaN prices and timezone-aware dates come straight from pandas data
+    fields = {
+        "quantity": np.int64(7),
+        "stop_loss": float("nan"),
+        "exit_submit_price": np.float64(101.5),
+        "entry_date": datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc),
+        "status": "OPEN",
+    }
+    submitted = {"observed_entry_date": datetime(2024, 1, 2), "entry_submit_date": datetime(2024, 1, 2)}
+    inserted = _position(bot_name, **submitted, **fields)
+    db.create_position(inserted)
+    updated = _position(bot_name, **submitted)
+    db.create_position(updated)
+    for name, value in fields.items():
+        setattr(updated, name, value)
+    db.update_positions([updated])
+
+    first, second = _stored_rows(db, inserted, updated)
+    assert first == second
+    assert '"stop_loss": "NaN"' in first
+
+def test_reads_are_not_cached_by_default(db, pg_params, bot_name):
+    other = TradeKitDB(**pg_params)
+    try:
+        assert other.get_last_position(bot_name, "AAPL") is None
+        db.create_position(_position(bot_name))
+        assert other.get_last_position(bot_name, "AAPL") is not None
+    finally:
+        other.close()
+
+def test_a_read_racing_an_eviction_is_not_cached(pg_params, bot_name):
+    db = TradeKitDB(**pg_params, cache_ttl=60)
+    try:
+        def fetch(bot_name, ticker):
+            # e.g. the listener thread evicting the entry while the read is in flight
+            db._evict(bot_name, ticker)
+            return None
+        db._cached("last", bot_name, "AAPL", fetch)
+        assert db.cache_info()["size"] == 0
+        db._cached("last", bot_name, "AAPL", lambda bot_name, ticker: None)
+        assert db.cache_info()["size"] == 1
+    finally:
+        db.close()
+
+def _stored_count(pg_params, bot_name):
+    """Number of committed positions of the bot, read over a connection of its own."""
+    with psycopg.connect(dbname=pg_params["db_name"], user=pg_params["user"], password=pg_params["password"],
+                         host=pg_params["host"], port=pg_params["port"]) as conn:
+        return conn.execute("SELECT count(*) FROM trades WHERE bot_name = %s", (bot_name,)).fetchone()[0]
+
+def test_transaction_commits_once_on_exit(db, pg_params, bot_name):
+    with db.transaction():
+        db.create_position(_position(bot_name))
+        db.create_position(_position(bot_name))
+        assert _stored_count(pg_params, bot_name) == 0
+        assert db.get_last_position(bot_name, "AAPL") is not None
+    assert _stored_count(pg_params, bot_name) == 2
+
+def test_transaction_rolls_back_a_failed_statement(db, pg_params, bot_name):
+    with pytest.raises(psycopg.Error):
+        with db.transaction():
+            db.create_position(_position(bot_name))
+            # the price overflows its NUMERIC(10,2) column
+            db.create_position(_position(bot_name, entry_submit_price=1e9))
+    assert _stored_count(pg_params, bot_name) == 0
+
+def test_transaction_rolls_back_a_wrapped_or_swallowed_failure(db, pg_params, bot_name):
+    with pytest.raises(RuntimeError, match="wrapped"):
+        with db.transaction():
+            db.create_position(_position(bot_name))
+            try:
+                db.create_position(_position(bot_name, entry_submit_price=1e9))
+            except psycopg.Error:
+                raise RuntimeError("wrapped")
+    with pytest.raises(RuntimeError, match="rolled back"):
+        with db.transaction():
+            db.create_position(_position(bot_name))
+            try:
+                db.create_position(_position(bot_name, entry_submit_price=1e9))
+            except psycopg.Error:
+                pass
+    assert _stored_count(pg_params, bot_name) == 0
+
+def test_transaction_commits_before_other_errors(db, pg_params, bot_name):
+    with pytest.raises(KeyError):
+        with db.transaction():
+            db.create_position(_position(bot_name))
+            raise KeyError("strategy error")
+    assert _stored_count(pg_params, bot_name) == 1
+
+def test_nested_transactions_share_the_connection(db):
+    with db.transaction():
+        with db._connection() as outer, db.transaction(), db._connection() as inner:
+            assert inner is outer
+
+def test_buffered_writes_are_flushed_creates_first(db, pg_params, bot_name):
+    stored = _position(bot_name, status="OPEN")
+    db.create_position(stored)
+    buffer = db.write_buffer()
+    with db.buffering(buffer):
+        created = _position(bot_name, status="OPEN")
+        assert db.create_position(created) is None
+        # the update of a position not inserted yet is folded into its insert
+        created.quantity = 20
+        db.update_position(created)
+        stored.status = "CLOSED"
+        db.update_position(stored)
+        assert len(buffer) == 2
+        assert _stored_count(pg_params, bot_name) == 1
+    db.flush(buffer)
+
+    assert len(buffer) == 0
+    assert created.id is not None and created.id > stored.id
+    last = db.get_last_position(bot_name, "AAPL")
+    assert (last.id, last.quantity) == (created.id, 20)
+    latest_open = db.get_latest_open_position(bot_name, "AAPL")
+    assert latest_open.id == created.id
+
+def test_reads_flush_the_buffer_in_use(db, bot_name):
+    with db.buffering(db.write_buffer()):
+        position = _position(bot_name)
+        db.create_position(position)
+        assert db.get_last_position(bot_name, "AAPL").id == position.id
+    assert position.id is not None
+
+def test_a_full_buffer_is_flushed(db, pg_params, bot_name):
+    db.WRITE_BUFFER_SIZE = 2
+    buffer = db.write_buffer()
+    with db.buffering(buffer):
+        first, second = _position(bot_name), _position(bot_name)
+        db.create_position(first)
+        assert first.id is None
+        db.create_position(second)
+    assert len(buffer) == 0
+    assert second.id == first.id + 1
+    assert _stored_count(pg_params, bot_name) == 2
+
+def test_in_memory_create_assigns_the_id():
+    db = InMemoryTradeKitDB()
+    position = _position("test")
+    trade_id = db.create_position(position)
+    assert trade_id == position.id == 1
+    assert db.create_positions([_position("test"), _position("test")]) == [2, 3]
+
+def test_in_memory_stores_and_returns_copies():
+    db = InMemoryTradeKitDB()
+    position = _position("test", status="OPEN")
+    db.create_position(position)
+    position.quantity = 20
+    assert db.get_last_position("test", "AAPL").quantity == 10
+    read = db.get_latest_open_position("test", "AAPL")
+    read.quantity = 30
+    assert read is not db.get_latest_open_position("test", "AAPL")
+    db.update_position(read)
+    assert db.get_last_position("test", "AAPL").quantity == 30
+
+def test_in_memory_has_no_shared_instance():
+    with pytest.raises(RuntimeError):
+        InMemoryTradeKitDB.get_default()
+
+def test_in_memory_runs_the_inherited_methods():
+    db = InMemoryTradeKitDB()
+    with db.transaction(), db.buffering(db.write_buffer()):
+        db.create_position(_position("test"))
+    db.flush()
+    db.cache_clear()
+    assert db.cache_info() == {"hits": 0, "misses": 0, "size": 0}
+    assert db._current_buffer() is None
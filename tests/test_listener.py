@@ -0,0 +1,54 @@
+import asyncio
+import time
+import psycopg
+from tradekit import AsyncTradeKitDB, TradeKitDB, TradeKitPosition
+
+def _positions(bot_name, count):
+    return [
+        TradeKitPosition(bot_name=bot_name, ticker="AAPL", position_type="LONG", quantity=10, action="BUY", entry_submit_price=100.0)
+        for _ in range(count)
+    ]
+
+def test_bulk_writes_notify_once_per_statement(db, pg_params, bot_name):
+    with psycopg.connect(dbname=pg_params["db_name"], user=pg_params["user"], password=pg_params["password"],
+                         host=pg_params["host"], port=pg_params["port"], autocommit=True) as conn:
+        conn.execute(f"LISTEN {TradeKitDB.NOTIFY_CHANNEL}")
+        db.bulk_load_positions(_positions(bot_name, 3))
+        db.create_positions(_positions(bot_name, 3))
+        payloads = [notify.payload for notify in conn.notifies(timeout=1)]
+    assert payloads == [f"{bot_name}|AAPL", f"{bot_name}|AAPL"]
+
+def test_listener_is_opt_in(db):
+    assert db._listener is None
+
+def test_listener_evicts_reads_written_by_others(db, pg_params, bot_name):
+    cached = TradeKitDB(**pg_params, cache_ttl=60, listen=True)
+    try:
+        assert cached.get_last_position(bot_name, "AAPL") is None
+        assert cached.cache_info()["size"] == 1
+        positions = _positions(bot_name, 3)
+        db.bulk_load_positions(positions)
+        deadline = time.monotonic() + 5
+        while cached.cache_info()["size"] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert cached.get_last_position(bot_name, "AAPL").id == positions[-1].id
+    finally:
+        cached.close()
+    assert cached._listener is None
+
+def test_async_listener_evicts_reads_written_by_others(db, pg_params, bot_name):
+    async def main():
+        cached = AsyncTradeKitDB(**pg_params, cache_ttl=60, listen=True)
+        await cached.open()
+        try:
+            assert await cached.get_last_position(bot_name, "AAPL") is None
+            positions = _positions(bot_name, 3)
+            db.bulk_load_positions(positions)
+            deadline = time.monotonic() + 5
+            while cached.cache_info()["size"] and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            assert (await cached.get_last_position(bot_name, "AAPL")).id == positions[-1].id
+        finally:
+            await cached.close()
+        assert cached._listener is None
+    asyncio.run(main())
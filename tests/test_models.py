@@ -0,0 +1,17 @@
+from datetime import datetime, timedelta, timezone
+import numpy as np
+import pandas as pd
+from tradekit import PositionTable, TradeKitPosition
+
+def test_to_dict_formats_aware_dates_in_utc_like_position_table():
+    bar = pd.Timestamp("2024-03-01 09:30:15", tz="America/New_York")
+    table = PositionTable("test", "AAPL")
+    ts = np.array([bar.value])
+    table.extend("LONG", np.array([10]), np.array([100.0]), ts, np.array([0.0]), np.array([0]), np.array([False]))
+    aware = datetime(2024, 3, 1, 9, 30, 15, tzinfo=timezone(timedelta(hours=-5)))
+    position = TradeKitPosition(bot_name="test", ticker="AAPL", position_type="LONG", quantity=10, action="BUY",
+                                entry_submit_price=100.0, entry_date=aware)
+
+    assert position.to_dict()["entry_date"] == "2024-03-01 14:30:15"
+    assert table.position(0).to_dict()["entry_date"] == position.to_dict()["entry_date"]
+    assert position.to_dict()["exit_date"] is None